@@ -1,10 +1,17 @@
 import matplotlib.pyplot as plt
 import numpy as np
+from numba import njit
 from scipy.integrate import solve_ivp
+import hashlib
 import os
 import json
 import datetime
 
+try:
+    import orjson  # much faster CZML serialization; optional
+except ImportError:
+    orjson = None
+
 # Constants
 omega = 2.6617e-6         # rad/s, Moon rotation rate
 Re = 1737100              # m, lunar radius
@@ -22,6 +29,7 @@ tburn = 750                # s, burn duration (approximate)
 m_dot = Thrust / (Isp * 9.81)  # kg/s, mass flow rate
 
 m0 = mstruc + mprop + mpl
+_dry = mstruc + mpl        # kg, burnout mass, hoisted out of the RHS
 
 # Initial Conditions for Descent
 v0 = 1600                  # m/s, orbital velocity at 15 km altitude
@@ -35,61 +43,475 @@ target_altitude = 0        # m, surface altitude
 target_radius = Re         # m, lunar surface radius
 
 # Adjusted Pitch Program for Descent
+@njit(cache=True, fastmath=True)
 def pitch_program(t):
     """Returns the target pitch angle at time t for descent"""
-    if t < 100:
-        return -5 * deg  # Initial descent angle
-    elif t < 500:
-        return -45 * deg  # Steeper descent
-    else:
-        return -90 * deg  # Vertical descent
+    # Branchless piecewise schedule: -5 deg initially, -45 deg from 100 s
+    # (steeper descent), -90 deg from 500 s (vertical descent)
+    return deg * (-5.0 - 40.0 * (t >= 100) - 45.0 * (t >= 500))
 
 # Adjusted Throttle Program for Descent
+@njit(cache=True, fastmath=True)
 def throttle_program(t, h, v):
     """Returns thrust fraction based on time and state for descent"""
-    if h < 1000:  # Close to the surface
-        return 0.3  # Low throttle for soft landing
-    return 1.0  # Full thrust otherwise
+    # Full thrust, dropping to 0.3 below 1000 m for a soft landing
+    return 1.0 - 0.7 * (h < 1000)
+
+@njit(cache=True, fastmath=True)
+def _rhs(t, r, theta, v, gamma, m):
+    """Compiled state-derivative kernel shared by all RHS evaluations"""
+    # Calculate local gravity (r*r skips the generic pow path)
+    g = mu / (r * r)
 
-def derivatives(t, state):
-    """Calculates state derivatives in a rotating reference frame"""
-    r, theta, v, gamma, m = state
-    
-    # Calculate local gravity
-    g = mu / r**2
-    
     # Determine if engine is burning and remaining propellant
-    remaining_propellant = m - (mstruc + mpl)
+    remaining_propellant = m - _dry
     if t < tburn and remaining_propellant > 0:
         throttle = throttle_program(t, r - Re, v)
         T = Thrust * throttle
         mdot = -m_dot * throttle
     else:
-        T = 0
-        mdot = 0
-    
+        T = 0.0
+        mdot = 0.0
+
     # Target pitch from guidance
     gamma_target = pitch_program(t)
-    
+
     # Simple proportional control for pitch rate with rate limiting
     K_p = 0.1  # Proportional gain
     max_rate = 0.5 * deg  # Maximum pitch rate (deg/s)
     desired_rate = K_p * (gamma_target - gamma)
-    gamma_dot = np.clip(desired_rate, -max_rate, max_rate)
-    
+    # Inline clamp (scalar np.clip does not compile under nopython mode)
+    gamma_dot = min(max(desired_rate, -max_rate), max_rate)
+
+    # Shared trig terms (sin/cos of gamma each appear three times below)
+    sg = np.sin(gamma)
+    cg = np.cos(gamma)
+
     # State derivatives
-    r_dot = v * np.sin(gamma)
-    theta_dot = v * np.cos(gamma) / r
-    
+    r_dot = v * sg
+    theta_dot = v * cg / r
+
     # Acceleration components
     a_thrust = T / m
     a_gravity = -g
-    a_centripetal = v**2 * np.cos(gamma)**2 / r  # Centripetal acceleration
-    
+    a_centripetal = v * v * cg * cg / r  # Centripetal acceleration
+
     # Velocity derivative (corrected with all components)
-    v_dot = a_thrust + a_gravity * np.sin(gamma) + a_centripetal * np.sin(gamma)
-    
-    return [r_dot, theta_dot, v_dot, gamma_dot, mdot]
+    v_dot = a_thrust + (a_gravity + a_centripetal) * sg
+
+    return (r_dot, theta_dot, v_dot, gamma_dot, mdot)
+
+@njit(cache=True, fastmath=True)
+def _derivatives_core(t, state, out):
+    d = _rhs(t, state[0], state[1], state[2], state[3], state[4])
+    out[0] = d[0]
+    out[1] = d[1]
+    out[2] = d[2]
+    out[3] = d[3]
+    out[4] = d[4]
+    return out
+
+def derivatives(t, state):
+    """Calculates state derivatives in a rotating reference frame.
+
+    Returns a fresh array each call: scipy's implicit solvers hold on to
+    previous RHS results (Radau keeps f0 across Newton iterations), so a
+    shared output buffer would be silently overwritten under them.
+    """
+    return _derivatives_core(t, np.asarray(state), np.empty(5))
+
+def analytic_jac(t, state):
+    """Analytic 5x5 Jacobian of the state derivatives.
+
+    Lets the scipy cross-check path run an implicit method (Radau) without
+    finite-differencing the RHS once per state column. Thrust and mass flow
+    are piecewise constant in the state, so their columns are zero.
+    """
+    r, theta, v, gamma, m = state
+    sg = np.sin(gamma)
+    cg = np.cos(gamma)
+    g = mu / r**2
+
+    remaining_propellant = m - _dry
+    if t < tburn and remaining_propellant > 0:
+        T = Thrust * throttle_program(t, r - Re, v)
+    else:
+        T = 0.0
+
+    J = np.zeros((5, 5))
+    # r_dot = v*sin(gamma)
+    J[0, 2] = sg
+    J[0, 3] = v * cg
+    # theta_dot = v*cos(gamma)/r
+    J[1, 0] = -v * cg / r**2
+    J[1, 2] = cg / r
+    J[1, 3] = -v * sg / r
+    # v_dot = T/m - g*sin(gamma) + v**2*cos(gamma)**2*sin(gamma)/r
+    J[2, 0] = 2 * mu / r**3 * sg - v**2 * cg**2 * sg / r**2
+    J[2, 2] = 2 * v * cg**2 * sg / r
+    J[2, 3] = -g * cg + v**2 / r * (cg**3 - 2 * sg**2 * cg)
+    J[2, 4] = -T / m**2
+    # gamma_dot = clamp(K_p*(gamma_target - gamma)): -K_p in the linear
+    # region, zero when the rate limit saturates
+    K_p = 0.1
+    max_rate = 0.5 * deg
+    if abs(K_p * (pitch_program(t) - gamma)) < max_rate:
+        J[3, 3] = -K_p
+    # mdot only depends on t, so its row stays zero
+    return J
+
+# Compiled Dormand-Prince RK45 integrator. The state is carried as a
+# 5-tuple (r, theta, v, gamma, m) so Numba unrolls the stage arithmetic
+# into register operations instead of looping over a small array, and the
+# whole march runs without touching the interpreter.
+@njit(cache=True, fastmath=True)
+def _dp_step(t, y, h):
+    """One Dormand-Prince step from (t, y); returns (y_new, error_estimate)"""
+    r, th, v, ga, m = y
+
+    k1 = _rhs(t, r, th, v, ga, m)
+    k2 = _rhs(t + h / 5,
+              r + h * (k1[0] / 5),
+              th + h * (k1[1] / 5),
+              v + h * (k1[2] / 5),
+              ga + h * (k1[3] / 5),
+              m + h * (k1[4] / 5))
+    k3 = _rhs(t + 3 * h / 10,
+              r + h * (3 * k1[0] / 40 + 9 * k2[0] / 40),
+              th + h * (3 * k1[1] / 40 + 9 * k2[1] / 40),
+              v + h * (3 * k1[2] / 40 + 9 * k2[2] / 40),
+              ga + h * (3 * k1[3] / 40 + 9 * k2[3] / 40),
+              m + h * (3 * k1[4] / 40 + 9 * k2[4] / 40))
+    k4 = _rhs(t + 4 * h / 5,
+              r + h * (44 * k1[0] / 45 - 56 * k2[0] / 15 + 32 * k3[0] / 9),
+              th + h * (44 * k1[1] / 45 - 56 * k2[1] / 15 + 32 * k3[1] / 9),
+              v + h * (44 * k1[2] / 45 - 56 * k2[2] / 15 + 32 * k3[2] / 9),
+              ga + h * (44 * k1[3] / 45 - 56 * k2[3] / 15 + 32 * k3[3] / 9),
+              m + h * (44 * k1[4] / 45 - 56 * k2[4] / 15 + 32 * k3[4] / 9))
+    k5 = _rhs(t + 8 * h / 9,
+              r + h * (19372 * k1[0] / 6561 - 25360 * k2[0] / 2187 + 64448 * k3[0] / 6561 - 212 * k4[0] / 729),
+              th + h * (19372 * k1[1] / 6561 - 25360 * k2[1] / 2187 + 64448 * k3[1] / 6561 - 212 * k4[1] / 729),
+              v + h * (19372 * k1[2] / 6561 - 25360 * k2[2] / 2187 + 64448 * k3[2] / 6561 - 212 * k4[2] / 729),
+              ga + h * (19372 * k1[3] / 6561 - 25360 * k2[3] / 2187 + 64448 * k3[3] / 6561 - 212 * k4[3] / 729),
+              m + h * (19372 * k1[4] / 6561 - 25360 * k2[4] / 2187 + 64448 * k3[4] / 6561 - 212 * k4[4] / 729))
+    k6 = _rhs(t + h,
+              r + h * (9017 * k1[0] / 3168 - 355 * k2[0] / 33 + 46732 * k3[0] / 5247 + 49 * k4[0] / 176 - 5103 * k5[0] / 18656),
+              th + h * (9017 * k1[1] / 3168 - 355 * k2[1] / 33 + 46732 * k3[1] / 5247 + 49 * k4[1] / 176 - 5103 * k5[1] / 18656),
+              v + h * (9017 * k1[2] / 3168 - 355 * k2[2] / 33 + 46732 * k3[2] / 5247 + 49 * k4[2] / 176 - 5103 * k5[2] / 18656),
+              ga + h * (9017 * k1[3] / 3168 - 355 * k2[3] / 33 + 46732 * k3[3] / 5247 + 49 * k4[3] / 176 - 5103 * k5[3] / 18656),
+              m + h * (9017 * k1[4] / 3168 - 355 * k2[4] / 33 + 46732 * k3[4] / 5247 + 49 * k4[4] / 176 - 5103 * k5[4] / 18656))
+
+    # 5th-order solution
+    y_new = (r + h * (35 * k1[0] / 384 + 500 * k3[0] / 1113 + 125 * k4[0] / 192 - 2187 * k5[0] / 6784 + 11 * k6[0] / 84),
+             th + h * (35 * k1[1] / 384 + 500 * k3[1] / 1113 + 125 * k4[1] / 192 - 2187 * k5[1] / 6784 + 11 * k6[1] / 84),
+             v + h * (35 * k1[2] / 384 + 500 * k3[2] / 1113 + 125 * k4[2] / 192 - 2187 * k5[2] / 6784 + 11 * k6[2] / 84),
+             ga + h * (35 * k1[3] / 384 + 500 * k3[3] / 1113 + 125 * k4[3] / 192 - 2187 * k5[3] / 6784 + 11 * k6[3] / 84),
+             m + h * (35 * k1[4] / 384 + 500 * k3[4] / 1113 + 125 * k4[4] / 192 - 2187 * k5[4] / 6784 + 11 * k6[4] / 84))
+
+    k7 = _rhs(t + h, y_new[0], y_new[1], y_new[2], y_new[3], y_new[4])
+
+    # Difference between the 5th- and embedded 4th-order solutions
+    err = (h * (71 * k1[0] / 57600 - 71 * k3[0] / 16695 + 71 * k4[0] / 1920 - 17253 * k5[0] / 339200 + 22 * k6[0] / 525 - k7[0] / 40),
+           h * (71 * k1[1] / 57600 - 71 * k3[1] / 16695 + 71 * k4[1] / 1920 - 17253 * k5[1] / 339200 + 22 * k6[1] / 525 - k7[1] / 40),
+           h * (71 * k1[2] / 57600 - 71 * k3[2] / 16695 + 71 * k4[2] / 1920 - 17253 * k5[2] / 339200 + 22 * k6[2] / 525 - k7[2] / 40),
+           h * (71 * k1[3] / 57600 - 71 * k3[3] / 16695 + 71 * k4[3] / 1920 - 17253 * k5[3] / 339200 + 22 * k6[3] / 525 - k7[3] / 40),
+           h * (71 * k1[4] / 57600 - 71 * k3[4] / 16695 + 71 * k4[4] / 1920 - 17253 * k5[4] / 339200 + 22 * k6[4] / 525 - k7[4] / 40))
+
+    return y_new, err
+
+@njit(cache=True)
+def _error_norm(y, y_new, err, rtol, atol):
+    """RMS of the component errors scaled by the mixed tolerance
+
+    No fastmath here: a bad trial step must surface as a NaN norm so the
+    controller can reject it, and fastmath licenses the compiler to assume
+    NaN never happens
+    """
+    s = 0.0
+    for i in range(5):
+        scale = atol + rtol * max(abs(y[i]), abs(y_new[i]))
+        s += (err[i] / scale) ** 2
+    return np.sqrt(s / 5)
+
+@njit(cache=True, fastmath=True)
+def _state_at(t0, y0, t1):
+    """State at t1 obtained by a single Dormand-Prince step from (t0, y0)"""
+    y1, _ = _dp_step(t0, y0, t1 - t0)
+    return y1
+
+@njit(cache=True)
+def rk45_integrate(t0, t_end, y0, rtol, atol, max_step):
+    """Adaptive Dormand-Prince march from t0 to t_end with event handling.
+
+    Terminates when the surface is reached (r crossing target_radius from
+    above, located by bisection) and records the first propellant-depletion
+    crossing. Returns (t_array, state_array, t_propellant_depleted).
+
+    fastmath is deliberately off: the driver's control flow depends on NaN
+    behaving like NaN (the step-rejection test and the depletion bookkeeping),
+    and fastmath lets the compiler fold those checks away
+    """
+    cap = 1024
+    ts = np.empty(cap)
+    ys = np.empty((cap, 5))
+    n = 0
+
+    t = t0
+    y = y0
+    ts[n] = t
+    for i in range(5):
+        ys[n, i] = y[i]
+    n += 1
+
+    # Hairer-style initial step: a small fraction of the state-to-derivative
+    # ratio, so the controller starts near the right scale instead of at
+    # the ceiling
+    f0 = _rhs(t0, y[0], y[1], y[2], y[3], y[4])
+    ny = 0.0
+    nf = 0.0
+    for i in range(5):
+        ny += y[i] * y[i]
+        nf += f0[i] * f0[i]
+    if nf > 0.0:
+        h = 0.01 * np.sqrt(ny / nf)
+    else:
+        h = 1.0
+    h = min(h, max_step, t_end - t0)
+    t_prop = np.nan
+    prop_found = False
+
+    while t < t_end:
+        if n == cap:
+            # Grow the preallocated trajectory buffers before this iteration
+            # can append (normal step or terminal-event sample alike)
+            cap *= 2
+            ts_big = np.empty(cap)
+            ys_big = np.empty((cap, 5))
+            ts_big[:n] = ts[:n]
+            ys_big[:n] = ys[:n]
+            ts = ts_big
+            ys = ys_big
+
+        # State-dependent ceiling: free stepping during cruise, but fine
+        # steps on final approach so the surface crossing is well resolved
+        h_cap = 0.5 if y[0] - target_radius < 2000.0 else max_step
+        h = min(h, h_cap, t_end - t)
+
+        y_new, err = _dp_step(t, y, h)
+        v_norm = _error_norm(y, y_new, err, rtol, atol)
+
+        if not (v_norm <= 1.0):
+            # Rejected step (a NaN norm lands here too): shrink following
+            # the standard PI-style rule
+            h = h * max(0.2, 0.9 * v_norm ** -0.2)
+            continue
+
+        t_new = t + h
+
+        # Propellant-depletion event (non-terminal, crossing from above);
+        # an explicit flag, not an isnan test, marks the first crossing
+        g_prev = y[4] - _dry - 1.0
+        g_new = y_new[4] - _dry - 1.0
+        if not prop_found and g_prev > 0 and g_new <= 0:
+            lo = t
+            hi = t_new
+            for _ in range(60):
+                mid = 0.5 * (lo + hi)
+                if _state_at(t, y, mid)[4] - _dry - 1.0 > 0:
+                    lo = mid
+                else:
+                    hi = mid
+            t_prop = 0.5 * (lo + hi)
+            prop_found = True
+
+        # Surface event (terminal, crossing from above)
+        g_prev = y[0] - target_radius
+        g_new = y_new[0] - target_radius
+        if g_prev > 0 and g_new <= 0:
+            lo = t
+            hi = t_new
+            for _ in range(60):
+                mid = 0.5 * (lo + hi)
+                if _state_at(t, y, mid)[0] - target_radius > 0:
+                    lo = mid
+                else:
+                    hi = mid
+            t_hit = 0.5 * (lo + hi)
+            y_hit = _state_at(t, y, t_hit)
+            ts[n] = t_hit
+            for i in range(5):
+                ys[n, i] = y_hit[i]
+            n += 1
+            break
+
+        t = t_new
+        y = y_new
+
+        ts[n] = t
+        for i in range(5):
+            ys[n, i] = y[i]
+        n += 1
+
+        # Accepted step: grow within the controller's bounds
+        h = min(h * min(0.9 * v_norm ** -0.2, 5.0), max_step)
+
+    return ts[:n], ys[:n], t_prop
+
+def make_descent_rhs(thrust=Thrust, isp=Isp, m_struc=mstruc, m_pl=mpl, t_burn=tburn):
+    """Build a jitted RHS with the vehicle parameters baked in as literals.
+
+    Numba freezes the closed-over values at compile time, so the burnout
+    mass and thrust/mass-flow products fold into immediates. A parameter
+    sweep gets one specialized kernel per vehicle configuration instead of
+    every call re-reading module globals. cache=True is deliberately
+    omitted here: numba's disk cache does not key on closure-cell values,
+    so two different parameter sets could collide on one cached binary.
+    """
+    dry = m_struc + m_pl
+    mdot_full = thrust / (isp * 9.81)
+
+    @njit(fastmath=True)
+    def rhs(t, r, theta, v, gamma, m):
+        g = mu / (r * r)
+
+        remaining_propellant = m - dry
+        if t < t_burn and remaining_propellant > 0:
+            throttle = throttle_program(t, r - Re, v)
+            T = thrust * throttle
+            mdot = -mdot_full * throttle
+        else:
+            T = 0.0
+            mdot = 0.0
+
+        gamma_target = pitch_program(t)
+
+        K_p = 0.1
+        max_rate = 0.5 * deg
+        desired_rate = K_p * (gamma_target - gamma)
+        gamma_dot = min(max(desired_rate, -max_rate), max_rate)
+
+        sg = np.sin(gamma)
+        cg = np.cos(gamma)
+        r_dot = v * sg
+        theta_dot = v * cg / r
+
+        a_thrust = T / m
+        a_centripetal = v * v * cg * cg / r
+        v_dot = a_thrust + (a_centripetal - g) * sg
+
+        return (r_dot, theta_dot, v_dot, gamma_dot, mdot)
+
+    return rhs
+
+# Batched variants for dispersion (Monte-Carlo) analysis. The RHS accepts
+# Y with shape (5, N) so N perturbed trajectories advance per evaluation:
+# one NumPy dispatch per step instead of N Python calls, with contiguous
+# SIMD-friendly arithmetic across the batch.
+def derivatives_batch(t, Y):
+    """Batched state derivatives; Y has shape (5, N)"""
+    r, theta, v, gamma, m = Y
+
+    g = mu / r**2
+
+    # Engine state as masks instead of scalar branches
+    remaining_propellant = m - _dry
+    burning = (t < tburn) & (remaining_propellant > 0)
+    throttle = np.where(r - Re < 1000, 0.3, 1.0)
+    T = np.where(burning, Thrust * throttle, 0.0)
+    mdot = np.where(burning, -m_dot * throttle, 0.0)
+
+    # Guidance shares the batch clock, so the target pitch stays scalar
+    gamma_target = pitch_program(t)
+
+    K_p = 0.1
+    max_rate = 0.5 * deg
+    gamma_dot = np.clip(K_p * (gamma_target - gamma), -max_rate, max_rate)
+
+    sin_gamma = np.sin(gamma)
+    cos_gamma = np.cos(gamma)
+    r_dot = v * sin_gamma
+    theta_dot = v * cos_gamma / r
+
+    a_thrust = T / m
+    a_gravity = -g
+    a_centripetal = v**2 * cos_gamma**2 / r
+    v_dot = a_thrust + a_gravity * sin_gamma + a_centripetal * sin_gamma
+
+    out = np.empty_like(Y)
+    out[0] = r_dot
+    out[1] = theta_dot
+    out[2] = v_dot
+    out[3] = gamma_dot
+    out[4] = mdot
+    return out
+
+def _dp_step_batch(t, Y, h):
+    """One Dormand-Prince step of the whole batch; returns (Y_new, error)"""
+    k1 = derivatives_batch(t, Y)
+    k2 = derivatives_batch(t + h / 5, Y + h * (k1 / 5))
+    k3 = derivatives_batch(t + 3 * h / 10, Y + h * (3 * k1 / 40 + 9 * k2 / 40))
+    k4 = derivatives_batch(t + 4 * h / 5, Y + h * (44 * k1 / 45 - 56 * k2 / 15 + 32 * k3 / 9))
+    k5 = derivatives_batch(t + 8 * h / 9, Y + h * (19372 * k1 / 6561 - 25360 * k2 / 2187 + 64448 * k3 / 6561 - 212 * k4 / 729))
+    k6 = derivatives_batch(t + h, Y + h * (9017 * k1 / 3168 - 355 * k2 / 33 + 46732 * k3 / 5247 + 49 * k4 / 176 - 5103 * k5 / 18656))
+
+    Y_new = Y + h * (35 * k1 / 384 + 500 * k3 / 1113 + 125 * k4 / 192 - 2187 * k5 / 6784 + 11 * k6 / 84)
+    k7 = derivatives_batch(t + h, Y_new)
+
+    err = h * (71 * k1 / 57600 - 71 * k3 / 16695 + 71 * k4 / 1920 - 17253 * k5 / 339200 + 22 * k6 / 525 - k7 / 40)
+    return Y_new, err
+
+def rk45_integrate_batch(t0, t_end, Y0, rtol, atol, max_step):
+    """Advance N perturbed trajectories in lock-step with a shared step.
+
+    The step size is controlled by the worst-case error across the batch;
+    members that have touched down are frozen at their landing state.
+    Returns (t_array, state_array) with state_array shaped (n_steps, 5, N).
+    """
+    t = t0
+    Y = np.array(Y0, dtype=float)
+    ts = [t]
+    Ys = [Y.copy()]
+    h = min(max_step, t_end - t0)
+
+    while t < t_end:
+        if t + h > t_end:
+            h = t_end - t
+
+        Y_new, err = _dp_step_batch(t, Y, h)
+
+        scale = atol + rtol * np.maximum(np.abs(Y), np.abs(Y_new))
+        v_norm = np.sqrt(np.mean((err / scale) ** 2, axis=0)).max()
+
+        if v_norm > 1.0:
+            h = h * max(0.9 * v_norm ** -0.2, 0.2)
+            continue
+
+        # Freeze members that have already reached the surface
+        landed = Y[0] <= target_radius
+        Y_new[:, landed] = Y[:, landed]
+
+        t = t + h
+        Y = Y_new
+        ts.append(t)
+        Ys.append(Y.copy())
+
+        if np.all(Y[0] <= target_radius):
+            break
+
+        h = min(h * min(0.9 * v_norm ** -0.2, 5.0), max_step)
+
+    return np.array(ts), np.array(Ys)
+
+def run_dispersions(n_samples=100, seed=0):
+    """Integrate a batch of dispersed descents and return their histories"""
+    rng = np.random.default_rng(seed)
+    Y0 = np.empty((5, n_samples))
+    Y0[0] = r0 + rng.normal(0, 500, n_samples)          # altitude dispersion
+    Y0[1] = theta0
+    Y0[2] = v0 + rng.normal(0, 10, n_samples)           # velocity dispersion
+    Y0[3] = gamma0 + rng.normal(0, 0.1 * deg, n_samples)
+    Y0[4] = m0
+    return rk45_integrate_batch(0.0, float(t_max), Y0, 1e-6, 1e-8, 1.0)
 
 # Event function for reaching the surface
 def reach_surface(t, state):
@@ -98,219 +520,302 @@ def reach_surface(t, state):
 reach_surface.terminal = True
 reach_surface.direction = -1  # Trigger when crossing from above
 
-# Event function for propellant depletion 
+# Event function for propellant depletion
 def propellant_depleted(t, state):
     r, theta, v, gamma, m = state
-    return m - (mstruc + mpl) - 1.0  # 1kg margin
+    return m - _dry - 1.0  # 1kg margin
 propellant_depleted.terminal = False
 propellant_depleted.direction = -1  # Only trigger when crossing from above
 
 # Initial state for descent
 initial_state = [r0, theta0, v0, gamma0, m0]
 
-# Solve the descent trajectory
-sol = solve_ivp(
-    derivatives,
-    [0, t_max],
-    initial_state,
-    method='RK45',
-    events=[reach_surface, propellant_depleted],
-    rtol=1e-6,
-    atol=1e-8,
-    max_step=1.0
-)
-
-# Extract results
-t = sol.t
-r = sol.y[0]
-theta = sol.y[1]
-v = sol.y[2]
-gamma = sol.y[3]
-m = sol.y[4]
-
-# Calculate acceleration at each time step
-accel = np.zeros_like(t)
-for i in range(len(t)):
-    g = mu / r[i]**2
-    throttle = throttle_program(t[i], r[i] - Re, v[i]) if t[i] < tburn and m[i] > (mstruc + mpl) else 0
-    T = Thrust * throttle
-    a_thrust = T / m[i]
+# Set USE_SCIPY = True to cross-check against scipy's RK45 implementation.
+USE_SCIPY = False
+
+def run_descent_sim():
+    """Integrate the descent trajectory and return its state histories.
+
+    Importing this module no longer runs the simulation, so external
+    drivers (Monte-Carlo sweeps, tuning loops) can call this repeatedly
+    without triggering plots or CZML output. Returns a dict with the
+    arrays t, r, theta, v, gamma, m.
+    """
+    # The trajectory only depends on the constants above and on which
+    # integrator produced it, so cache it on disk keyed by their hash -
+    # rerunning the script for plot/CZML tweaks then skips the integration
+    # entirely, while flipping USE_SCIPY or max_step gets a fresh run
+    cache_key = hashlib.sha1(repr(
+        (Thrust, Isp, mstruc, mprop, mpl, v0, gamma0, r0, theta0, tburn, t_max,
+         1e-6, 1e-8, USE_SCIPY, 1.0 if USE_SCIPY else 60.0)
+    ).encode()).hexdigest()[:16]
+    cache_path = os.path.join(os.path.dirname(__file__), f".cache_descent_{cache_key}.npz")
+
+    if os.path.exists(cache_path):
+        cached = np.load(cache_path)
+        t = cached["t"]
+        y = cached["y"]
+    else:
+        if USE_SCIPY:
+            # A 1 Hz t_eval grid bounds the output buffer up front instead
+            # of letting sol.y grow with every accepted step
+            sol = solve_ivp(
+                derivatives,
+                [0, t_max],
+                initial_state,
+                method='Radau',
+                jac=analytic_jac,
+                events=[reach_surface, propellant_depleted],
+                t_eval=np.arange(0, t_max + 1.0, 1.0),
+                rtol=1e-6,
+                atol=1e-8,
+                max_step=1.0
+            )
+            t = sol.t
+            y = sol.y
+        else:
+            t, Y, t_prop_depleted = rk45_integrate(
+                0.0, float(t_max),
+                (float(r0), float(theta0), float(v0), float(gamma0), float(m0)),
+                1e-6, 1e-8, 60.0
+            )
+            y = Y.T
+        np.savez_compressed(cache_path, t=t, y=y)
+
+    r, theta, v, gamma, m = y
+    return {"t": t, "r": r, "theta": theta, "v": v, "gamma": gamma, "m": m}
+
+@njit(cache=True, fastmath=True)
+def _derived_arrays(r, theta, v, gamma):
+    """Fill all derived plotting arrays in one pass over the trajectory.
+
+    One cache-line load of (r, theta, v, gamma) per sample feeds every
+    output, instead of six separate sweeps over the state arrays.
+    """
+    n = r.shape[0]
+    h = np.empty(n)
+    h_km = np.empty(n)
+    v_km_s = np.empty(n)
+    gamma_deg = np.empty(n)
+    dx = np.empty(n)
+    dy = np.empty(n)
+    downrange = np.empty(n)
+    for i in range(n):
+        h[i] = r[i] - Re                 # m, altitude
+        h_km[i] = h[i] / 1000            # km, altitude
+        v_km_s[i] = v[i] / 1000          # km/s, velocity
+        gamma_deg[i] = gamma[i] / deg    # deg, flight path angle
+        dx[i] = r[i] * np.sin(theta[i])  # m, x-position
+        dy[i] = r[i] * np.cos(theta[i])  # m, y-position
+        downrange[i] = theta[i] * Re / 1000  # km, downrange distance
+    return h, h_km, v_km_s, gamma_deg, dx, dy, downrange
+
+def print_summary(sim):
+    """Print the landing-state summary for a completed descent"""
+    t = sim["t"]
+    r = sim["r"]
+    theta = sim["theta"]
+    v = sim["v"]
+    gamma = sim["gamma"]
+    m = sim["m"]
+    print("\n--- Apollo 11 Lunar Module Descent Simulation Results ---")
+    print(f"Simulation time: {t[-1]:.1f} seconds")
+    print(f"Final Altitude: {(r[-1] - Re) / 1000:.2f} km")
+    print(f"Final Velocity: {v[-1] / 1000:.4f} km/s")
+    print(f"Final Flight Path Angle: {gamma[-1] / deg:.2f} degrees")
+    print(f"Downrange Distance: {theta[-1] * Re / 1000:.2f} km")
+    print(f"Propellant Remaining: {m[-1] - mstruc - mpl:.2f} kg")
+    print(f"Reason for termination: {'Landed on surface' if r[-1] <= target_radius else 'Propellant depleted'}")
+
+def make_plots(sim):
+    """Render the trajectory and performance figures for a descent run"""
+    t = sim["t"]
+    r = sim["r"]
+    theta = sim["theta"]
+    v = sim["v"]
+    gamma = sim["gamma"]
+    m = sim["m"]
+
+    # Calculate acceleration at each time step (vectorized: a burn mask
+    # replaces the per-sample Python branch)
+    g = mu / r**2
+    burning = (t < tburn) & (m > _dry)
+    throttle = np.where(burning, throttle_program(t, r - Re, v), 0.0)
+    a_thrust = Thrust * throttle / m
     a_gravity = -g
-    a_centripetal = v[i]**2 * np.cos(gamma[i])**2 / r[i]
-    accel[i] = a_thrust + a_gravity * np.sin(gamma[i]) + a_centripetal * np.sin(gamma[i])
-
-h = r - Re                     # m, altitude
-h_km = h / 1000                # km, altitude
-v_km_s = v / 1000              # km/s, velocity
-gamma_deg = gamma / deg        # deg, flight path angle
-dx = r * np.sin(theta)         # m, x-position
-dy = r * np.cos(theta)         # m, y-position
-downrange = theta * Re / 1000  # km, downrange distance
-
-# Print results
-print("\n--- Apollo 11 Lunar Module Descent Simulation Results ---")
-print(f"Simulation time: {t[-1]:.1f} seconds")
-print(f"Final Altitude: {h_km[-1]:.2f} km")
-print(f"Final Velocity: {v_km_s[-1]:.4f} km/s")
-print(f"Final Flight Path Angle: {gamma_deg[-1]:.2f} degrees")
-print(f"Downrange Distance: {downrange[-1]:.2f} km")
-print(f"Propellant Remaining: {m[-1] - mstruc - mpl:.2f} kg")
-print(f"Reason for termination: {'Landed on surface' if r[-1] <= target_radius else 'Propellant depleted'}")
-
-plt.figure(figsize=(15, 10))
-
-# Altitude vs Time
-plt.subplot(2, 3, 1)
-plt.plot(t, h_km)
-plt.axhline(y=target_altitude, color='r', linestyle='--', label='Target Altitude')
-plt.title('Altitude vs Time')
-plt.xlabel('Time (s)')
-plt.ylabel('Altitude (km)')
-plt.grid(True)
-plt.legend()
-
-# Velocity vs Time
-plt.subplot(2, 3, 2)
-plt.plot(t, v_km_s)
-plt.title('Velocity vs Time')
-plt.xlabel('Time (s)')
-plt.ylabel('Velocity (km/s)')
-plt.grid(True)
-
-# Flight Path Angle vs Time
-plt.subplot(2, 3, 3)
-plt.plot(t, gamma_deg)
-plt.title('Flight Path Angle vs Time')
-plt.xlabel('Time (s)')
-plt.ylabel('Flight Path Angle (deg)')
-plt.grid(True)
-
-# Trajectory in Lunar Reference Frame
-plt.subplot(2, 3, 4)
-# Plot the Moon
-moon_circle = plt.Circle((0, 0), Re/1000, color='gray', alpha=0.3)
-plt.gca().add_patch(moon_circle)
-
-# Plot the trajectory
-plt.plot(dx/1000, dy/1000, 'b-')
-plt.axis('equal')
-plt.title('Trajectory (Lunar Reference Frame)')
-plt.xlabel('X (km)')
-plt.ylabel('Y (km)')
-plt.grid(True)
-
-# Downrange vs Altitude
-plt.subplot(2, 3, 5)
-plt.plot(downrange, h_km)
-plt.title('Trajectory Profile')
-plt.xlabel('Downrange Distance (km)')
-plt.ylabel('Altitude (km)')
-plt.grid(True)
-
-# Mass vs Time
-plt.subplot(2, 3, 6)
-plt.plot(t, m)
-plt.axhline(y=mstruc+mpl, color='r', linestyle='--', label='Dry Mass')
-plt.title('Vehicle Mass vs Time')
-plt.xlabel('Time (s)')
-plt.ylabel('Mass (kg)')
-plt.grid(True)
-plt.legend()
-
-plt.tight_layout()
-plt.show()
-
-plt.figure(figsize=(15, 5))
-
-# Acceleration vs Time
-plt.subplot(1, 3, 1)
-plt.plot(t, accel)
-plt.title('Acceleration vs Time')
-plt.xlabel('Time (s)')
-plt.ylabel('Acceleration (m/s²)')
-plt.grid(True)
-
-# Mass Flow Rate
-plt.subplot(1, 3, 2)
-m_flow = np.zeros_like(t)
-for i in range(len(t)-1):
-    m_flow[i] = (m[i+1] - m[i])/(t[i+1] - t[i])
-plt.plot(t[:-1], -m_flow[:-1])  # Negative because mass decreases
-plt.title('Mass Flow Rate vs Time')
-plt.xlabel('Time (s)')
-plt.ylabel('Mass Flow Rate (kg/s)')
-plt.grid(True)
-
-# Guidance vs Actual Flight Path Angle
-plt.subplot(1, 3, 3)
-guidance_angle = np.array([pitch_program(time) for time in t])
-plt.plot(t, guidance_angle/deg, 'r--', label='Guidance')
-plt.plot(t, gamma_deg, 'b-', label='Actual')
-plt.title('Guidance vs Actual Flight Path Angle')
-plt.xlabel('Time (s)')
-plt.ylabel('Angle (deg)')
-plt.legend()
-plt.grid(True)
-
-plt.tight_layout()
-plt.show()
-
-# Set the epoch to the actual date and time of Apollo 11 lunar module descent
-epoch = datetime.datetime(1969, 7, 20, 17, 44, 0)  # UTC time of lunar module descent initiation
-
-# Generate CZML data
-czml = [
-    {
-        "id": "document",
-        "name": "LM Descent Trajectory",
-        "version": "1.0",
-        "clock": {
-            "interval": f"{epoch.isoformat()}Z/{(epoch + datetime.timedelta(seconds=t_max)).isoformat()}Z",
-            "currentTime": f"{epoch.isoformat()}Z",
-            "range": "LOOP_STOP",
-            "step": "SYSTEM_CLOCK_MULTIPLIER"
+    a_centripetal = v**2 * np.cos(gamma)**2 / r
+    accel = a_thrust + (a_gravity + a_centripetal) * np.sin(gamma)
+
+    h, h_km, v_km_s, gamma_deg, dx, dy, downrange = _derived_arrays(
+        np.ascontiguousarray(r), np.ascontiguousarray(theta),
+        np.ascontiguousarray(v), np.ascontiguousarray(gamma))
+
+    # Build each figure once through the object API instead of re-driving
+    # the pyplot state machine per subplot
+    fig, axs = plt.subplots(2, 3, figsize=(15, 10))
+
+    # Altitude vs Time
+    axs[0, 0].plot(t, h_km)
+    axs[0, 0].axhline(y=target_altitude, color='r', linestyle='--', label='Target Altitude')
+    axs[0, 0].set_title('Altitude vs Time')
+    axs[0, 0].set_xlabel('Time (s)')
+    axs[0, 0].set_ylabel('Altitude (km)')
+    axs[0, 0].grid(True)
+    axs[0, 0].legend()
+
+    # Velocity vs Time
+    axs[0, 1].plot(t, v_km_s)
+    axs[0, 1].set_title('Velocity vs Time')
+    axs[0, 1].set_xlabel('Time (s)')
+    axs[0, 1].set_ylabel('Velocity (km/s)')
+    axs[0, 1].grid(True)
+
+    # Flight Path Angle vs Time
+    axs[0, 2].plot(t, gamma_deg)
+    axs[0, 2].set_title('Flight Path Angle vs Time')
+    axs[0, 2].set_xlabel('Time (s)')
+    axs[0, 2].set_ylabel('Flight Path Angle (deg)')
+    axs[0, 2].grid(True)
+
+    # Trajectory in Lunar Reference Frame
+    # Plot the Moon (kept vector; the dense trajectory line is rasterized
+    # so saved figures stay small)
+    moon_circle = plt.Circle((0, 0), Re/1000, color='gray', alpha=0.3)
+    axs[1, 0].add_patch(moon_circle)
+    axs[1, 0].plot(dx/1000, dy/1000, 'b-', rasterized=True)
+    axs[1, 0].axis('equal')
+    axs[1, 0].set_title('Trajectory (Lunar Reference Frame)')
+    axs[1, 0].set_xlabel('X (km)')
+    axs[1, 0].set_ylabel('Y (km)')
+    axs[1, 0].grid(True)
+
+    # Downrange vs Altitude
+    axs[1, 1].plot(downrange, h_km)
+    axs[1, 1].set_title('Trajectory Profile')
+    axs[1, 1].set_xlabel('Downrange Distance (km)')
+    axs[1, 1].set_ylabel('Altitude (km)')
+    axs[1, 1].grid(True)
+
+    # Mass vs Time
+    axs[1, 2].plot(t, m)
+    axs[1, 2].axhline(y=mstruc+mpl, color='r', linestyle='--', label='Dry Mass')
+    axs[1, 2].set_title('Vehicle Mass vs Time')
+    axs[1, 2].set_xlabel('Time (s)')
+    axs[1, 2].set_ylabel('Mass (kg)')
+    axs[1, 2].grid(True)
+    axs[1, 2].legend()
+
+    fig.tight_layout()
+    plt.show()
+    plt.close(fig)
+
+    fig2, axs2 = plt.subplots(1, 3, figsize=(15, 5))
+
+    # Acceleration vs Time
+    axs2[0].plot(t, accel)
+    axs2[0].set_title('Acceleration vs Time')
+    axs2[0].set_xlabel('Time (s)')
+    axs2[0].set_ylabel('Acceleration (m/s²)')
+    axs2[0].grid(True)
+
+    # Mass Flow Rate
+    m_flow = np.diff(m) / np.diff(t)
+    axs2[1].plot(t[:-1], -m_flow)  # Negative because mass decreases
+    axs2[1].set_title('Mass Flow Rate vs Time')
+    axs2[1].set_xlabel('Time (s)')
+    axs2[1].set_ylabel('Mass Flow Rate (kg/s)')
+    axs2[1].grid(True)
+
+    # Guidance vs Actual Flight Path Angle
+    # The branchless pitch program evaluates the whole time array in one call
+    guidance_angle = pitch_program(t)
+    axs2[2].plot(t, guidance_angle/deg, 'r--', label='Guidance')
+    axs2[2].plot(t, gamma_deg, 'b-', label='Actual')
+    axs2[2].set_title('Guidance vs Actual Flight Path Angle')
+    axs2[2].set_xlabel('Time (s)')
+    axs2[2].set_ylabel('Angle (deg)')
+    axs2[2].legend()
+    axs2[2].grid(True)
+
+    fig2.tight_layout()
+    plt.show()
+    plt.close(fig2)
+
+def write_czml(sim):
+    """Serialize the descent trajectory to a CZML file for Cesium playback"""
+    # Resample onto a uniform 1 Hz grid: CZML sample density then no
+    # longer follows the integrator's step selection, and the linear
+    # interpolation in Cesium sees an even cadence
+    t = np.arange(0.0, sim["t"][-1] + 1.0, 1.0)
+    r = np.interp(t, sim["t"], sim["r"])
+    theta = np.interp(t, sim["t"], sim["theta"])
+
+    # Set the epoch to the actual date and time of Apollo 11 lunar module descent
+    epoch = datetime.datetime(1969, 7, 20, 17, 44, 0)  # UTC time of lunar module descent initiation
+
+    # Generate CZML data
+    czml = [
+        {
+            "id": "document",
+            "name": "LM Descent Trajectory",
+            "version": "1.0",
+            "clock": {
+                "interval": f"{epoch.isoformat()}Z/{(epoch + datetime.timedelta(seconds=t_max)).isoformat()}Z",
+                "currentTime": f"{epoch.isoformat()}Z",
+                "range": "LOOP_STOP",
+                "step": "SYSTEM_CLOCK_MULTIPLIER"
+            }
         }
-    }
-]
-
-# Add descent stage trajectory
-descent_positions = []
-for i in range(len(t)):
-    x = r[i] * np.sin(theta[i])
-    y = r[i] * np.cos(theta[i])
-    z = 0  # Assume motion in the lunar equatorial plane
-    descent_positions.extend([t[i], x, y, z])
-
-czml.append({
-    "id": "DescentStage",
-    "availability": f"{epoch.isoformat()}Z/{(epoch + datetime.timedelta(seconds=t_max)).isoformat()}Z",
-    "path": {
-        "leadTime": 0,
-        "material": {
-            "solidColor": {
-                "color": {
-                    "rgba": [255, 0, 0, 255]  # Red color for descent stage
+    ]
+
+    # Add descent stage trajectory, interleaved as [t, x, y, z, t, x, y, z,
+    # ...] in one vectorized pass (z = 0: motion stays in the lunar
+    # equatorial plane)
+    descent_positions = np.column_stack(
+        [t, r * np.sin(theta), r * np.cos(theta), np.zeros_like(t)]
+    ).ravel()
+
+    czml.append({
+        "id": "DescentStage",
+        "availability": f"{epoch.isoformat()}Z/{(epoch + datetime.timedelta(seconds=t_max)).isoformat()}Z",
+        "path": {
+            "leadTime": 0,
+            "material": {
+                "solidColor": {
+                    "color": {
+                        "rgba": [255, 0, 0, 255]  # Red color for descent stage
+                    }
                 }
-            }
+            },
+            "width": 2,
+            "show": True
         },
-        "width": 2,
-        "show": True
-    },
-    "position": {
-        "interpolationAlgorithm": "LINEAR",
-        "epoch": epoch.isoformat() + "Z",
-        "cartesian": descent_positions
-    },
-   "model": {
-        "gltf": "/models/lm/lunarmodule.gltf",
-        "minimumPixelSize": 64,
-        "maximumScale": 20000
-    }
-})
-
-# Write CZML to file
-czml_file_path = os.path.join(os.path.dirname(__file__), "lm_descent_trajectory.czml")
-with open(czml_file_path, "w") as czml_file:
-    json.dump(czml, czml_file, indent=2)
-
-print(f"CZML file written to {czml_file_path}")
\ No newline at end of file
+        "position": {
+            "interpolationAlgorithm": "LINEAR",
+            "epoch": epoch.isoformat() + "Z",
+            "cartesian": descent_positions
+        },
+       "model": {
+            "gltf": "/models/lm/lunarmodule.gltf",
+            "minimumPixelSize": 64,
+            "maximumScale": 20000
+        }
+    })
+
+    # Write CZML to file. orjson serializes the ndarray position samples
+    # directly; the stdlib fallback converts them via the default hook.
+    czml_file_path = os.path.join(os.path.dirname(__file__), "lm_descent_trajectory.czml")
+    if orjson is not None:
+        with open(czml_file_path, "wb") as czml_file:
+            czml_file.write(orjson.dumps(czml, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(czml_file_path, "w") as czml_file:
+            json.dump(czml, czml_file, indent=2, default=lambda o: o.tolist())
+
+    print(f"CZML file written to {czml_file_path}")
+
+if __name__ == "__main__":
+    sim = run_descent_sim()
+    print_summary(sim)
+    make_plots(sim)
+    write_czml(sim)
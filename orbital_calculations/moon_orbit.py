@@ -1,10 +1,17 @@
-import matplotlib.pyplot as plt
+import argparse
 import numpy as np
-from scipy.integrate import solve_ivp
+from numba import njit
+from scipy.integrate import ode
+import hashlib
 import os
 import json
 import datetime
 
+try:
+    import orjson  # much faster CZML serialization; optional
+except ImportError:
+    orjson = None
+
 # Constants
 omega = 2.6617e-6         # rad/s, Moon rotation rate
 Re = 1738500             # m, lunar radius
@@ -56,46 +63,41 @@ t_max_rendezvous = 7200   # s, max rendezvous sim time
 
 # CSM Orbit Simulation
 def csm_orbit(t, initial_phase):
-    """Calculate CSM position at time t with given initial phase"""
+    """Calculate CSM position at time t (scalar or array) with given initial phase"""
     # Orbital period
     period = csm_period
     # Current phase
-    phase = initial_phase - (t / period) * 2 * np.pi  
+    phase = initial_phase - (t / period) * 2 * np.pi
     # Position
     x = csm_radius * np.cos(phase)
     y = csm_radius * np.sin(phase)
-    z = 0  # Assuming equatorial orbit
+    z = np.zeros_like(x)  # Assuming equatorial orbit
     return x, y, z, phase
 # Descent Stage Guidance
+# Post-PDI pitch schedule as lookup tables so the pitch program indexes a
+# binary search instead of walking an if/elif chain on every call
+_descent_pitch_thresholds = np.array([0.1, 0.3, 0.5, 0.7, 0.85, 0.95])
+_descent_pitch_angles = np.array([-10.0, -15.0, -25.0, -35.0, -50.0, -70.0, -85.0]) * deg
+
+@njit(cache=True, fastmath=True)
 def descent_pitch_program(t, altitude, target_alt=0):
     """Returns the target pitch angle for descent at time t and altitude"""
     # Pre-PDI phase (from 19:08 to 20:05) - very shallow trajectory
     if t < pdi_seconds:
         return -1 * deg  # Very shallow descent angle before PDI
-    
+
     # Target approximately 12.5 minutes from PDI to landing
     target_descent_duration = 12.5 * 60  # 12.5 minutes in seconds
-    
+
     # Calculate how far we are into the post-PDI descent as a percentage
     elapsed_since_pdi = t - pdi_seconds
     descent_progress = min(1.0, elapsed_since_pdi / target_descent_duration)
+
+    # Gradual pitch transitions based on progress, -10 deg just after PDI
+    # down to -85 deg on final approach
+    return _descent_pitch_angles[np.searchsorted(_descent_pitch_thresholds, descent_progress, side='right')]
     
-    # More gradual pitch transitions based on progress
-    if descent_progress < 0.1:  # Initial post-PDI phase
-        return -10 * deg
-    elif descent_progress < 0.3:
-        return -15 * deg
-    elif descent_progress < 0.5:
-        return -25 * deg
-    elif descent_progress < 0.7:
-        return -35 * deg
-    elif descent_progress < 0.85:
-        return -50 * deg
-    elif descent_progress < 0.95:
-        return -70 * deg
-    else:
-        return -85 * deg  # Final approach
-    
+@njit(cache=True, fastmath=True)
 def descent_throttle_program(t, altitude, velocity):
     """Returns thrust fraction based on time, altitude and velocity"""
     descent_rate = -velocity  # Convert to positive for easier logic
@@ -124,51 +126,135 @@ def descent_throttle_program(t, altitude, velocity):
         else:
             return 0.5  # Very gentle final descent
 
+# Derivative buffers reused across RHS calls so each solver evaluation
+# fills the same ndarray instead of allocating a list that scipy then
+# converts (one allocation + conversion per call otherwise)
+_descent_dstate = np.empty(7)
+_ascent_dstate = np.empty(7)
+
 # Descent Trajectory Simulation
-def descent_derivatives(t, state):
-    """Calculate state derivatives for lunar descent"""
-    r, theta, phi, v, gamma, psi, m = state
-    
+@njit(cache=True, fastmath=True)
+def _descent_rhs(t, state, out):
+    """Compiled descent RHS; fills and returns the shared output buffer"""
+    r = state[0]
+    theta = state[1]
+    phi = state[2]
+    v = state[3]
+    gamma = state[4]
+    psi = state[5]
+    m = state[6]
+
     # Local gravity
     g = mu / r**2
-    
+
+    # Shared trig terms: sin/cos of gamma and psi each feed several
+    # derivatives below, so evaluate them once per call
+    sg = np.sin(gamma)
+    cg = np.cos(gamma)
+    sp = np.sin(psi)
+    cp = np.cos(psi)
+
     # Determine thrust
     remaining_propellant = m - (LM_Descent_mstruc + LM_Ascent_m0)
     if t < LM_Descent_tburn and remaining_propellant > 0:
         altitude = r - Re
         # For descent, negative velocity means descending
-        descent_rate = -v * np.sin(gamma)
+        descent_rate = -v * sg
         throttle = descent_throttle_program(t, altitude, descent_rate)
         T = LM_Descent_Thrust * throttle
         mdot = -LM_Descent_mdot * throttle
     else:
-        T = 0
-        mdot = 0
-    
+        T = 0.0
+        mdot = 0.0
+
     # Target pitch from guidance (negative for descent)
     gamma_target = descent_pitch_program(t, r - Re)
-    
+
     # Simple guidance
     K_p = 0.1  # Proportional gain
     max_rate = 1.0 * deg  # Max angular rate
-    gamma_dot = np.clip(K_p * (gamma_target - gamma), -max_rate, max_rate)
-    
+    desired_rate = K_p * (gamma_target - gamma)
+    # Plain min/max clamp: scalar np.clip goes through the ufunc machinery
+    gamma_dot = min(max(desired_rate, -max_rate), max_rate)
+
     # Position derivatives - for descent gamma is negative, so r_dot is negative
-    r_dot = v * np.sin(gamma)
-    theta_dot = v * np.cos(gamma) * np.cos(psi) / (r * np.cos(phi))
-    phi_dot = v * np.cos(gamma) * np.sin(psi) / r
-    
+    r_dot = v * sg
+    theta_dot = v * cg * cp / (r * np.cos(phi))
+    phi_dot = v * cg * sp / r
+
+    psi_dot = 0.0
 
-    psi_dot = 0
-    
     # Velocity derivative - thrust opposes gravity for controlled descent
     a_thrust = T / m
     a_gravity = -g  # Gravity pulls downward
-    
-    # For descent: thrust works against gravity, positive thrust slows descent
-    v_dot = a_thrust * np.sin(abs(gamma)) + a_gravity * np.sin(gamma)
-    
-    return [r_dot, theta_dot, phi_dot, v_dot, gamma_dot, psi_dot, mdot]
+
+    # For descent: thrust works against gravity, positive thrust slows
+    # descent (sin(|gamma|) == |sin(gamma)| while |gamma| <= pi)
+    v_dot = a_thrust * abs(sg) + a_gravity * sg
+
+    out[0] = r_dot
+    out[1] = theta_dot
+    out[2] = phi_dot
+    out[3] = v_dot
+    out[4] = gamma_dot
+    out[5] = psi_dot
+    out[6] = mdot
+    return out
+
+def descent_derivatives(t, state):
+    """Calculate state derivatives for lunar descent"""
+    return _descent_rhs(t, np.asarray(state), _descent_dstate)
+
+def descent_jac(t, state):
+    """Analytic 7x7 Jacobian of the descent derivatives.
+
+    Passed to LSODA so its stiff (BDF) phase does not finite-difference
+    the RHS once per state column. Throttle and guidance are piecewise
+    constant in the state, so their partials are the current segment's
+    subgradient; theta never appears on the right-hand side, and psi_dot
+    and mdot carry no state dependence, so those rows/columns stay zero.
+    """
+    r, theta, phi, v, gamma, psi, m = state
+    sg = np.sin(gamma)
+    cg = np.cos(gamma)
+    sp = np.sin(psi)
+    cp = np.cos(psi)
+    cphi = np.cos(phi)
+    g = mu / r**2
+
+    remaining_propellant = m - (LM_Descent_mstruc + LM_Ascent_m0)
+    if t < LM_Descent_tburn and remaining_propellant > 0:
+        descent_rate = -v * sg
+        T = LM_Descent_Thrust * descent_throttle_program(t, r - Re, descent_rate)
+    else:
+        T = 0.0
+
+    J = np.zeros((7, 7))
+    # r_dot = v*sin(gamma)
+    J[0, 3] = sg
+    J[0, 4] = v * cg
+    # theta_dot = v*cos(gamma)*cos(psi) / (r*cos(phi))
+    J[1, 0] = -v * cg * cp / (r**2 * cphi)
+    J[1, 2] = v * cg * cp * np.tan(phi) / (r * cphi)
+    J[1, 3] = cg * cp / (r * cphi)
+    J[1, 4] = -v * sg * cp / (r * cphi)
+    J[1, 5] = -v * cg * sp / (r * cphi)
+    # phi_dot = v*cos(gamma)*sin(psi) / r
+    J[2, 0] = -v * cg * sp / r**2
+    J[2, 3] = cg * sp / r
+    J[2, 4] = -v * sg * sp / r
+    J[2, 5] = v * cg * cp / r
+    # v_dot = (T/m)*sin(|gamma|) - g*sin(gamma)
+    J[3, 0] = 2 * mu / r**3 * sg
+    J[3, 4] = (T / m) * cg * np.sign(gamma) - g * cg
+    J[3, 6] = -T / m**2 * np.sin(abs(gamma))
+    # gamma_dot = clamp(K_p*(gamma_target - gamma)): -K_p in the linear
+    # region, zero when the rate limit saturates
+    K_p = 0.1
+    max_rate = 1.0 * deg
+    if abs(K_p * (descent_pitch_program(t, r - Re) - gamma)) < max_rate:
+        J[4, 4] = -K_p
+    return J
 
 # Event function for reaching surface
 def reach_surface(t, state):
@@ -178,17 +264,28 @@ reach_surface.terminal = True
 reach_surface.direction = -1  # Trigger when crossing from above
 
 # Ascent Stage Guidance
+# Dense pitch-over table: the 10-200 s window evaluates
+# 90*deg*(1 - sin(frac*pi/2)) on every RHS call, so precompute the curve
+# once and replace the libm sin with a linear table lookup
+_pitch_tab_n = 4096
+_ascent_pitch_tab = 90 * deg * (1 - np.sin(np.linspace(0.0, 1.0, _pitch_tab_n) * np.pi / 2))
+
+@njit(cache=True, fastmath=True)
 def ascent_pitch_program(t):
     """Returns the target pitch angle at time t during ascent"""
     if t < 10:
         return 90 * deg  # Vertical rise
     elif t < 200:
-        # Gradually pitch over
+        # Gradually pitch over, interpolating the precomputed sine table
         frac = (t - 10) / 190
-        return 90 * deg * (1 - np.sin(frac * np.pi/2))
+        x = frac * (_pitch_tab_n - 1)
+        i = int(x)
+        w = x - i
+        return _ascent_pitch_tab[i] * (1.0 - w) + _ascent_pitch_tab[i + 1] * w
     else:
         return 0 * deg  # Horizontal flight
 
+@njit(cache=True, fastmath=True)
 def ascent_throttle_program(t, h, v):
     """Returns thrust fraction based on time and state during ascent"""
     if t < LM_Ascent_tburn:
@@ -199,13 +296,26 @@ def ascent_throttle_program(t, h, v):
     return 0.0  # Engine cutoff
 
 # Ascent Trajectory Simulation
-def ascent_derivatives(t, state):
-    """Calculate state derivatives for lunar ascent"""
-    r, theta, phi, v, gamma, psi, m = state
-    
+@njit(cache=True, fastmath=True)
+def _ascent_rhs(t, state, out):
+    """Compiled ascent RHS; fills and returns the shared output buffer"""
+    r = state[0]
+    theta = state[1]
+    phi = state[2]
+    v = state[3]
+    gamma = state[4]
+    psi = state[5]
+    m = state[6]
+
     # Local gravity
     g = mu / r**2
-    
+
+    # Shared trig terms, evaluated once per call
+    sg = np.sin(gamma)
+    cg = np.cos(gamma)
+    sp = np.sin(psi)
+    cp = np.cos(psi)
+
     # Determine if engine is burning and remaining propellant
     remaining_propellant = m - (LM_Ascent_mstruc + LM_Ascent_mpl)
     if t < LM_Ascent_tburn and remaining_propellant > 0:
@@ -213,37 +323,112 @@ def ascent_derivatives(t, state):
         T = LM_Ascent_Thrust * throttle
         mdot = -LM_Ascent_mdot * throttle
     else:
-        T = 0
-        mdot = 0
-    
+        T = 0.0
+        mdot = 0.0
+
     # Target pitch from guidance
     gamma_target = ascent_pitch_program(t)
-    
-    # Simple proportional control for pitch
+
+    # Simple proportional control for pitch, plus the rotating-frame
+    # kinematic term (v/r - g/v)*cos(gamma): with it, an insertion at
+    # v = sqrt(mu/r), gamma = 0 coasts on a true circular Kepler orbit
     K_p = 0.1  # Proportional gain
     max_rate = 0.5 * deg  # Maximum pitch rate (deg/s)
-    gamma_dot = np.clip(K_p * (gamma_target - gamma), -max_rate, max_rate)
-    
+    desired_rate = K_p * (gamma_target - gamma)
+    # Plain min/max clamp: scalar np.clip goes through the ufunc machinery
+    gamma_dot = min(max(desired_rate, -max_rate), max_rate) + (v / r - g / v) * cg
+
     # Position derivatives
-    r_dot = v * np.sin(gamma)
-    theta_dot = v * np.cos(gamma) * np.cos(psi) / (r * np.cos(phi))
-    phi_dot = v * np.cos(gamma) * np.sin(psi) / r
-    
+    r_dot = v * sg
+    theta_dot = v * cg * cp / (r * np.cos(phi))
+    phi_dot = v * cg * sp / r
+
     # Calculate CSM position for rendezvous guidance
     # This is simplified - in reality would need more complex rendezvous logic
     if r - Re > 20000:  # Only start rendezvous guidance at higher altitude
-        psi_dot = 0  # Maintain heading during initial ascent
+        psi_dot = 0.0  # Maintain heading during initial ascent
     else:
-        psi_dot = 0  # Simplified - would need actual rendezvous guidance here
-    
-    # Velocity derivative
+        psi_dot = 0.0  # Simplified - would need actual rendezvous guidance here
+
+    # Velocity derivative: the centripetal relief belongs to gamma_dot
+    # above, not here - the old a_centripetal*sin(gamma) term in v_dot
+    # double-counted it
     a_thrust = T / m
     a_gravity = -g
-    a_centripetal = v**2 * np.cos(gamma)**2 / r
-    
-    v_dot = a_thrust + a_gravity * np.sin(gamma) + a_centripetal * np.sin(gamma)
-    
-    return [r_dot, theta_dot, phi_dot, v_dot, gamma_dot, psi_dot, mdot]
+
+    v_dot = a_thrust + a_gravity * sg
+
+    out[0] = r_dot
+    out[1] = theta_dot
+    out[2] = phi_dot
+    out[3] = v_dot
+    out[4] = gamma_dot
+    out[5] = psi_dot
+    out[6] = mdot
+    return out
+
+def ascent_derivatives(t, state):
+    """Calculate state derivatives for lunar ascent"""
+    return _ascent_rhs(t, np.asarray(state), _ascent_dstate)
+
+def ascent_jac(t, state):
+    """Analytic 7x7 Jacobian of the ascent derivatives.
+
+    Same layout as descent_jac. The one extra wrinkle is the near-target
+    throttle taper, which is linear in altitude inside its band, so its
+    r-partial feeds both v_dot and mdot.
+    """
+    r, theta, phi, v, gamma, psi, m = state
+    sg = np.sin(gamma)
+    cg = np.cos(gamma)
+    sp = np.sin(psi)
+    cp = np.cos(psi)
+    cphi = np.cos(phi)
+    g = mu / r**2
+
+    T = 0.0
+    dT_dr = 0.0
+    dmdot_dr = 0.0
+    remaining_propellant = m - (LM_Ascent_mstruc + LM_Ascent_mpl)
+    if t < LM_Ascent_tburn and remaining_propellant > 0:
+        h = r - Re
+        throttle = ascent_throttle_program(t, h, v)
+        T = LM_Ascent_Thrust * throttle
+        if h > target_radius - Re - 10000 and 0.6 < throttle < 1.0:
+            # throttle = (target_radius - Re - h)/10000 + 0.6 in this band
+            dT_dr = LM_Ascent_Thrust * (-1.0 / 10000)
+            dmdot_dr = -LM_Ascent_mdot * (-1.0 / 10000)
+
+    J = np.zeros((7, 7))
+    # r_dot = v*sin(gamma)
+    J[0, 3] = sg
+    J[0, 4] = v * cg
+    # theta_dot = v*cos(gamma)*cos(psi) / (r*cos(phi))
+    J[1, 0] = -v * cg * cp / (r**2 * cphi)
+    J[1, 2] = v * cg * cp * np.tan(phi) / (r * cphi)
+    J[1, 3] = cg * cp / (r * cphi)
+    J[1, 4] = -v * sg * cp / (r * cphi)
+    J[1, 5] = -v * cg * sp / (r * cphi)
+    # phi_dot = v*cos(gamma)*sin(psi) / r
+    J[2, 0] = -v * cg * sp / r**2
+    J[2, 3] = cg * sp / r
+    J[2, 4] = -v * sg * sp / r
+    J[2, 5] = v * cg * cp / r
+    # v_dot = T/m - g*sin(gamma)
+    J[3, 0] = dT_dr / m + 2 * mu / r**3 * sg
+    J[3, 4] = -g * cg
+    J[3, 6] = -T / m**2
+    # gamma_dot = clamp(K_p*(gamma_target - gamma)) + (v/r - g/v)*cos(gamma)
+    K_p = 0.1
+    max_rate = 0.5 * deg
+    J[4, 0] = (-v / r**2 + 2 * mu / (r**3 * v)) * cg
+    J[4, 3] = (1 / r + g / v**2) * cg
+    J[4, 4] = -(v / r - g / v) * sg
+    if abs(K_p * (ascent_pitch_program(t) - gamma)) < max_rate:
+        J[4, 4] += -K_p
+    # mdot = -LM_Ascent_mdot*throttle: nonzero partial only in the taper band
+    J[6, 0] = dmdot_dr
+    return J
 
 # Event function for reaching target altitude
 def reach_target_altitude(t, state):
@@ -252,7 +437,65 @@ def reach_target_altitude(t, state):
 reach_target_altitude.terminal = True
 reach_target_altitude.direction = 1  # Trigger when crossing from below
 
+def _integrate_lsoda(rhs, jac, y0, t_end, dt, event_fn, direction, breakpoints=()):
+    """March scipy.integrate.ode('lsoda') over a fixed output grid.
+
+    The low-level ode interface skips solve_ivp's per-step Python wrapper,
+    which is a real cost on a 7-state system, while keeping the 0.5 Hz
+    output cadence. Known guidance discontinuities can be listed in
+    breakpoints: the multistep history restarts there instead of suffering
+    order reduction across the switch. The terminal event is located by
+    bisecting fresh short solves of the bracketing grid interval, and the
+    event state is appended as the final sample. Returns
+    (t_array, state_array) with state_array shaped (7, n_samples) like
+    solve_ivp's sol.y.
+    """
+    edges = [0.0] + sorted(b for b in breakpoints if 0.0 < b < t_end) + [t_end]
+    ts = [0.0]
+    ys = [np.array(y0, dtype=float)]
+    g_prev = event_fn(0.0, ys[0])
+    y = ys[0]
+    for a, b in zip(edges[:-1], edges[1:]):
+        I = ode(rhs, jac).set_integrator('lsoda', rtol=1e-6, atol=1e-8, nsteps=10**6)
+        I.set_initial_value(y, a)
+        while I.successful() and I.t < b - 1e-12:
+            t_prev = I.t
+            y_prev = I.y.copy()
+            t_next = min(t_prev + dt, b)
+            y_next = I.integrate(t_next)
+            g_new = event_fn(I.t, y_next)
+            crossed = (g_prev > 0 >= g_new) if direction < 0 else (g_prev < 0 <= g_new)
+            if crossed:
+                def state_at(tm):
+                    J = ode(rhs, jac).set_integrator('lsoda', rtol=1e-6, atol=1e-8, nsteps=10**6)
+                    J.set_initial_value(y_prev, t_prev)
+                    return J.integrate(tm)
+                lo = t_prev
+                hi = I.t
+                for _ in range(40):
+                    mid = 0.5 * (lo + hi)
+                    g_mid = event_fn(mid, state_at(mid))
+                    if (g_mid > 0) if direction < 0 else (g_mid < 0):
+                        lo = mid
+                    else:
+                        hi = mid
+                t_hit = 0.5 * (lo + hi)
+                ts.append(t_hit)
+                ys.append(np.array(state_at(t_hit), dtype=float))
+                return np.array(ts), np.array(ys).T
+            ts.append(I.t)
+            ys.append(y_next.copy())
+            g_prev = g_new
+        y = I.y.copy()
+    return np.array(ts), np.array(ys).T
+
 # Run the simulations
+# Plotting is opt-in: a headless CZML-only pipeline should not pay the
+# matplotlib import (hundreds of ms and tens of MB) just to discard it
+parser = argparse.ArgumentParser(description="Apollo 11 mission simulation")
+parser.add_argument("--plot", action="store_true", help="render the trajectory figures")
+args = parser.parse_args()
+
 # 1. CSM orbit - generate positions for the entire mission
 mission_start = datetime.datetime(1969, 7, 20, 17, 0, 0)  # Approximate
 descent_start_time = datetime.datetime(1969, 7, 20, 19, 8, 0)  # Start of descent at 19:08 UT
@@ -264,8 +507,9 @@ mission_end = datetime.datetime(1969, 7, 21, 21, 0, 0)
 total_mission_time = (mission_end - mission_start).total_seconds()
 csm_times = np.linspace(0, total_mission_time, 1000)
 csm_initial_phase = 0  # Starting position of CSM (45 degrees back from 0)
-csm_positions = np.array([csm_orbit(t, csm_initial_phase) for t in csm_times])
-csm_x, csm_y, csm_z, csm_phases = csm_positions.T
+# csm_orbit broadcasts over the whole time array and already yields the
+# cartesian coordinates, so nothing downstream needs to reconvert them
+csm_x, csm_y, csm_z, csm_phases = csm_orbit(csm_times, csm_initial_phase)
 
 # Calculate PDI time in seconds from descent start
 pdi_seconds = (pdi_time - descent_start_time).total_seconds()
@@ -286,25 +530,36 @@ descent_initial_state = [
 # Update simulation parameters to account for longer descent time
 t_max_descent = total_descent_time + 100  # Add margin to the total descent time
 
+# Both phases depend only on the constants above, so cache the solver
+# output on disk keyed by their hash - rerunning the script for plot or
+# CZML tweaks then skips both integrations entirely
+_cache_key = hashlib.sha1(repr(
+    (omega, Re, g0, csm_alt, csm_initial_phase, launch_latitude, launch_longitude,
+     LM_Descent_Thrust, LM_Descent_Isp, LM_Descent_mstruc, LM_Descent_mprop,
+     LM_Descent_tburn, LM_Ascent_Thrust, LM_Ascent_Isp, LM_Ascent_mstruc,
+     LM_Ascent_mprop, LM_Ascent_mpl, LM_Ascent_tburn, target_altitude_km,
+     t_max_descent, t_max_ascent, pdi_seconds, 1e-6, 1e-8, 2.0, 'ode-lsoda')
+).encode()).hexdigest()[:16]
+_cache_path = os.path.join(os.path.dirname(__file__), f".cache_mission_{_cache_key}.npz")
+_cached = np.load(_cache_path) if os.path.exists(_cache_path) else None
+
 print("Simulating descent trajectory...")
-descent_sol = solve_ivp(
-    descent_derivatives, 
-    [0, t_max_descent], 
-    descent_initial_state,
-    method='RK45',
-    events=[reach_surface],
-    rtol=1e-6, 
-    atol=1e-8
-)
-
-descent_t = descent_sol.t
-descent_r = np.maximum(descent_sol.y[0], Re)
-descent_theta = descent_sol.y[1]
-descent_phi = descent_sol.y[2]
-descent_v = descent_sol.y[3]
-descent_gamma = descent_sol.y[4]
-descent_psi = descent_sol.y[5]
-descent_m = descent_sol.y[6]
+if _cached is not None:
+    descent_t = _cached["descent_t"]
+    descent_y = _cached["descent_y"]
+else:
+    descent_t, descent_y = _integrate_lsoda(
+        descent_derivatives, descent_jac, descent_initial_state,
+        t_max_descent, 2.0, reach_surface, -1,
+        breakpoints=(pdi_seconds, float(LM_Descent_tburn)))
+
+descent_r = np.maximum(descent_y[0], Re)
+descent_theta = descent_y[1]
+descent_phi = descent_y[2]
+descent_v = descent_y[3]
+descent_gamma = descent_y[4]
+descent_psi = descent_y[5]
+descent_m = descent_y[6]
 
 # Calculate PDI index in the solution for analysis
 pdi_index = np.argmin(np.abs(descent_t - pdi_seconds))
@@ -327,24 +582,24 @@ ascent_initial_state = [
 ]
 
 print("Simulating ascent trajectory...")
-ascent_sol = solve_ivp(
-    ascent_derivatives, 
-    [0, t_max_ascent], 
-    ascent_initial_state,
-    method='RK45',
-    events=[reach_target_altitude],
-    rtol=1e-6, 
-    atol=1e-8
-)
-
-ascent_t = ascent_sol.t
-ascent_r = ascent_sol.y[0]
-ascent_theta = ascent_sol.y[1]
-ascent_phi = ascent_sol.y[2]
-ascent_v = ascent_sol.y[3]
-ascent_gamma = ascent_sol.y[4]
-ascent_psi = ascent_sol.y[5]
-ascent_m = ascent_sol.y[6]
+if _cached is not None:
+    ascent_t = _cached["ascent_t"]
+    ascent_y = _cached["ascent_y"]
+else:
+    ascent_t, ascent_y = _integrate_lsoda(
+        ascent_derivatives, ascent_jac, ascent_initial_state,
+        t_max_ascent, 2.0, reach_target_altitude, 1,
+        breakpoints=(10.0, 200.0, float(LM_Ascent_tburn)))
+    np.savez_compressed(_cache_path, descent_t=descent_t, descent_y=descent_y,
+                        ascent_t=ascent_t, ascent_y=ascent_y)
+
+ascent_r = ascent_y[0]
+ascent_theta = ascent_y[1]
+ascent_phi = ascent_y[2]
+ascent_v = ascent_y[3]
+ascent_gamma = ascent_y[4]
+ascent_psi = ascent_y[5]
+ascent_m = ascent_y[6]
 
 print(f"Ascent complete.")
 print(f"Final altitude: {(ascent_r[-1] - Re)/1000:.2f} km")
@@ -357,88 +612,89 @@ ascent_start_time = takeoff_time
 ascent_end_time = takeoff_time + datetime.timedelta(seconds=ascent_t[-1])
 
 # Create Cartesian coordinates for visualization
-# Convert spherical coordinates to cartesian for visualization
+# Convert spherical coordinates to cartesian for visualization; works
+# elementwise on whole trajectory arrays, so each conversion below is a
+# single vectorized call instead of a per-sample Python loop
 def sphere_to_cart(r, theta, phi):
-    x = r * np.cos(phi) * np.cos(theta)
-    y = r * np.cos(phi) * np.sin(theta)
+    rc = r * np.cos(phi)  # equatorial projection, shared by x and y
+    x = rc * np.cos(theta)
+    y = rc * np.sin(theta)
     z = r * np.sin(phi)
     return x, y, z
 
-# CSM trajectory
-csm_cart = np.array([sphere_to_cart(csm_radius, csm_phases[i], 0) for i in range(len(csm_times))])
-csm_x, csm_y, csm_z = csm_cart.T
-
-
-# Descent trajectory
-descent_cart = np.array([
-    sphere_to_cart(max(descent_r[i], Re), descent_theta[i], descent_phi[i])
-    for i in range(len(descent_t))
-])
-descent_x, descent_y, descent_z = descent_cart.T
-# Ascent trajectory
-ascent_cart = np.array([sphere_to_cart(ascent_r[i], ascent_theta[i], ascent_phi[i]) for i in range(len(ascent_t))])
-ascent_x, ascent_y, ascent_z = ascent_cart.T
-
 # Visualize the trajectories
-plt.figure(figsize=(15, 10))
-
-# 3D plot of all trajectories
-ax = plt.subplot(2, 2, 1, projection='3d')
-# Draw the Moon
-u, v = np.mgrid[0:2*np.pi:20j, 0:np.pi:10j]
-x_moon = Re * np.cos(u) * np.sin(v)
-y_moon = Re * np.sin(u) * np.sin(v)
-z_moon = Re * np.cos(v)
-ax.plot_surface(x_moon, y_moon, z_moon, color='gray', alpha=0.2)
-
-# Plot CSM orbit
-ax.plot(csm_x, csm_y, csm_z, 'b-', label='CSM Orbit')
-
-# Plot descent
-ax.plot(descent_x, descent_y, descent_z, 'r-', label='Descent')
-
-# Plot ascent
-ax.plot(ascent_x, ascent_y, ascent_z, 'g-', label='Ascent')
-
-ax.set_title('Complete Mission Trajectory')
-ax.set_xlabel('X (m)')
-ax.set_ylabel('Y (m)')
-ax.set_zlabel('Z (m)')
-ax.legend()
-
-# Plot altitude vs time for descent
-plt.subplot(2, 2, 2)
-plt.plot(descent_t, descent_r - Re)
-plt.axvline(x=pdi_seconds, color='r', linestyle='--', label='PDI')
-plt.title('Descent: Altitude vs Time')
-plt.xlabel('Time (s)')
-plt.ylabel('Altitude (m)')
-plt.legend()
-plt.grid(True)
-
-# Plot altitude vs time for ascent
-plt.subplot(2, 2, 3)
-plt.plot(ascent_t, ascent_r - Re)
-plt.axhline(y=target_altitude_km*1000, color='r', linestyle='--', label='Target Altitude')
-plt.title('Ascent: Altitude vs Time')
-plt.xlabel('Time (s)')
-plt.ylabel('Altitude (m)')
-plt.grid(True)
-plt.legend()
-
-# Plot velocity vs time
-plt.subplot(2, 2, 4)
-plt.plot(descent_t, descent_v, 'r-', label='Descent')
-plt.plot(ascent_t, ascent_v, 'g-', label='Ascent')
-plt.axhline(y=v_target, color='b', linestyle='--', label='Orbit Velocity')
-plt.title('Velocity vs Time')
-plt.xlabel('Time (s)')
-plt.ylabel('Velocity (m/s)')
-plt.grid(True)
-plt.legend()
-
-plt.tight_layout()
-plt.show()
+def plot_results():
+    """Render the mission trajectory figures; matplotlib loads lazily"""
+    import matplotlib.pyplot as plt
+
+    # Full-grid cartesians are only needed here - the CZML tracks are
+    # resampled onto their own 1 Hz grids - so convert on demand instead
+    # of paying two trig sweeps on every CZML-only run
+    descent_x, descent_y, descent_z = sphere_to_cart(descent_r, descent_theta, descent_phi)
+    ascent_x, ascent_y, ascent_z = sphere_to_cart(ascent_r, ascent_theta, ascent_phi)
+
+    plt.figure(figsize=(15, 10))
+
+    # 3D plot of all trajectories
+    ax = plt.subplot(2, 2, 1, projection='3d')
+    # Draw the Moon
+    u, v = np.mgrid[0:2*np.pi:20j, 0:np.pi:10j]
+    x_moon = Re * np.cos(u) * np.sin(v)
+    y_moon = Re * np.sin(u) * np.sin(v)
+    z_moon = Re * np.cos(v)
+    ax.plot_surface(x_moon, y_moon, z_moon, color='gray', alpha=0.2)
+
+    # Plot CSM orbit
+    ax.plot(csm_x, csm_y, csm_z, 'b-', label='CSM Orbit')
+
+    # Plot descent
+    ax.plot(descent_x, descent_y, descent_z, 'r-', label='Descent')
+
+    # Plot ascent
+    ax.plot(ascent_x, ascent_y, ascent_z, 'g-', label='Ascent')
+
+    ax.set_title('Complete Mission Trajectory')
+    ax.set_xlabel('X (m)')
+    ax.set_ylabel('Y (m)')
+    ax.set_zlabel('Z (m)')
+    ax.legend()
+
+    # Plot altitude vs time for descent
+    plt.subplot(2, 2, 2)
+    plt.plot(descent_t, descent_r - Re)
+    plt.axvline(x=pdi_seconds, color='r', linestyle='--', label='PDI')
+    plt.title('Descent: Altitude vs Time')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Altitude (m)')
+    plt.legend()
+    plt.grid(True)
+
+    # Plot altitude vs time for ascent
+    plt.subplot(2, 2, 3)
+    plt.plot(ascent_t, ascent_r - Re)
+    plt.axhline(y=target_altitude_km*1000, color='r', linestyle='--', label='Target Altitude')
+    plt.title('Ascent: Altitude vs Time')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Altitude (m)')
+    plt.grid(True)
+    plt.legend()
+
+    # Plot velocity vs time
+    plt.subplot(2, 2, 4)
+    plt.plot(descent_t, descent_v, 'r-', label='Descent')
+    plt.plot(ascent_t, ascent_v, 'g-', label='Ascent')
+    plt.axhline(y=v_target, color='b', linestyle='--', label='Orbit Velocity')
+    plt.title('Velocity vs Time')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Velocity (m/s)')
+    plt.grid(True)
+    plt.legend()
+
+    plt.tight_layout()
+    plt.show()
+
+if args.plot:
+    plot_results()
 
 # Generate CZML for Cesium visualization
 czml = [
@@ -456,12 +712,15 @@ czml = [
     },
 ]
 
-# Add CSM trajectory
-csm_positions = []
-csm_time_increment = total_mission_time / 1000
-for i in range(len(csm_times)):
-    time_seconds = csm_times[i]
-    csm_positions.extend([time_seconds, csm_x[i], csm_y[i], csm_z[i]])
+# Add CSM trajectory, interleaved as [t, x, y, z, t, x, y, z, ...] in a
+# preallocated float32 buffer: half the bytes of float64 with ~0.25 m
+# quantization at lunar-radius scale, well under Cesium's display needs
+csm_positions = np.empty((len(csm_times), 4), dtype=np.float32)
+csm_positions[:, 0] = csm_times
+csm_positions[:, 1] = csm_x
+csm_positions[:, 2] = csm_y
+csm_positions[:, 3] = csm_z
+csm_positions = csm_positions.ravel()
 
 czml.append({
     "id": "CSM",
@@ -512,11 +771,20 @@ czml.append({
     }
 })
 
-# Add LM Descent trajectory
-descent_positions = []
-for i in range(len(descent_t)):
-    time_seconds = descent_t[i]
-    descent_positions.extend([time_seconds, descent_x[i], descent_y[i], descent_z[i]])
+# Add LM Descent trajectory, resampled onto a uniform 1 Hz grid so the
+# CZML cadence no longer follows the solver's step selection and the
+# Lagrange interpolation in Cesium sees evenly spaced control points
+descent_t_czml = np.arange(0.0, descent_t[-1] + 1.0, 1.0)
+descent_x_czml, descent_y_czml, descent_z_czml = sphere_to_cart(
+    np.interp(descent_t_czml, descent_t, descent_r),
+    np.interp(descent_t_czml, descent_t, descent_theta),
+    np.interp(descent_t_czml, descent_t, descent_phi))
+descent_positions = np.empty((len(descent_t_czml), 4), dtype=np.float32)
+descent_positions[:, 0] = descent_t_czml
+descent_positions[:, 1] = descent_x_czml
+descent_positions[:, 2] = descent_y_czml
+descent_positions[:, 3] = descent_z_czml
+descent_positions = descent_positions.ravel()
 
 czml.append({
     "id": "LM_Descent",
@@ -584,11 +852,18 @@ czml.append({
     }
 })
 
-# Add LM Ascent trajectory
-ascent_positions = []
-for i in range(len(ascent_t)):
-    time_seconds = ascent_t[i]
-    ascent_positions.extend([time_seconds, ascent_x[i], ascent_y[i], ascent_z[i]])
+# Add LM Ascent trajectory on the same uniform 1 Hz cadence
+ascent_t_czml = np.arange(0.0, ascent_t[-1] + 1.0, 1.0)
+ascent_x_czml, ascent_y_czml, ascent_z_czml = sphere_to_cart(
+    np.interp(ascent_t_czml, ascent_t, ascent_r),
+    np.interp(ascent_t_czml, ascent_t, ascent_theta),
+    np.interp(ascent_t_czml, ascent_t, ascent_phi))
+ascent_positions = np.empty((len(ascent_t_czml), 4), dtype=np.float32)
+ascent_positions[:, 0] = ascent_t_czml
+ascent_positions[:, 1] = ascent_x_czml
+ascent_positions[:, 2] = ascent_y_czml
+ascent_positions[:, 3] = ascent_z_czml
+ascent_positions = ascent_positions.ravel()
 
 czml.append({
     "id": "LM_Ascent",
@@ -624,9 +899,14 @@ czml.append({
     }
 })
 
-# Write CZML to file
+# Write CZML to file. orjson serializes the ndarray position samples
+# directly; the stdlib fallback converts them via the default hook.
 czml_file_path = os.path.join(os.path.dirname(__file__), "apollo11_mission.czml")
-with open(czml_file_path, "w") as czml_file:
-    json.dump(czml, czml_file, indent=2)
+if orjson is not None:
+    with open(czml_file_path, "wb") as czml_file:
+        czml_file.write(orjson.dumps(czml, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+else:
+    with open(czml_file_path, "w") as czml_file:
+        json.dump(czml, czml_file, indent=2, default=lambda o: o.tolist())
 
 print(f"CZML file written to {czml_file_path}")
\ No newline at end of file
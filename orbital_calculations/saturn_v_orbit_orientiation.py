@@ -1,11 +1,21 @@
+import argparse
+import math
+from datetime import datetime, timedelta
+
 import matplotlib.pyplot as plt
 import numpy as np
+from numba import njit
 from scipy.integrate import solve_ivp
 import os
 import json  # Add import for JSON to create CZML
 
+parser = argparse.ArgumentParser(description="Saturn V launch simulation")
+parser.add_argument("--pretty", action="store_true",
+                    help="indent the CZML output for readability (larger file, slower dump)")
+args = parser.parse_args()
+
 # rocket inputs
-# modelling the saturn V 
+# modelling the saturn V
 
 # Constants
 omega = 7.2921159e-5  # rad/s Earth's angular velocity
@@ -14,6 +24,7 @@ g0 = 9.81  # m/s² standard gravitational acceleration
 rho0 = 1.225  # kg/m³ sea-level air density
 hscale = 11100  # m scale height for Earth's atmosphere
 deg = np.pi / 180  # Conversion factor from degrees to radians https://stackoverflow.com/questions/10140029/convert-latitude-longitude-in-degree-radians
+GM = g0 * Re**2  # m³/s² gravitational parameter, so g = GM/r² and v_circ = sqrt(GM/r)
 
 # Add launch pad delay (4 minutes 15 seconds = 255 seconds)
 launch_delay = 255  # seconds before rocket starts to move
@@ -22,6 +33,7 @@ launch_delay = 255  # seconds before rocket starts to move
 diam = 10.0584  # m (33 ft converted to meters)
 A = np.pi / 4 * (diam)**2  # m² frontal area
 CD = 0.515  # Drag coefficient https://space.stackexchange.com/questions/12649/how-can-i-estimate-the-coefficient-of-drag-on-a-saturn-v-rocket-a-simulator-or
+A_CD = 0.5 * A * CD  # m² combined drag constant, so D = A_CD * rho * v²
 
 # Stage 1
 mprop = 2145000  # kg propellant mass
@@ -85,161 +97,298 @@ target_altitude_s2 = 175000  # 175 km after stage 2
 target_altitude_orbit = 160000  # 160 km orbital altitude
 target_velocity_tli = 10.8  # km/s TLI target velocity (escape velocity)
 
+# Pitch program as per-segment linear tables (degrees): within segment i the
+# target angle is clamp(a0[i] + slope[i] * (t_since_launch - t0[i]), lo, hi).
+# The 10 s offset in the first segment is the original pitchover delay
+# (hturn / v0 with v0 = 0 falls back to 10)
+_pitch_ends = np.cumsum(np.array([tburn1, tburn2, tburn3_1, tcoast3, tburn3_2], dtype=np.float64))
+_pitch_t0 = np.concatenate((np.zeros(1), _pitch_ends[:-1]))
+_pitch_a0 = np.array([89.5 + 44.5 * 10.0 / tburn1, 45.0, 5.0, 0.0, 0.0, 2.0])
+_pitch_slope = np.array([-44.5 / tburn1, -35.0 / tburn2, -5.0 / tburn3_1, 0.0, 10.0 / tburn3_2, 0.0])
+_pitch_lo = np.array([45.0, 5.0, 0.0, 0.0, 0.0, 2.0])
+_pitch_hi = np.array([np.inf, np.inf, np.inf, 0.0, 10.0, 2.0])
+
+# Stage mass/thrust tables (seconds since launch): stage i runs up to
+# _stage_ends[i] with m = _stage_m0[i] - _stage_mdot[i] * (t - _stage_t0[i]).
+# One searchsorted lookup replaces the chain of cumulative-sum comparisons
+# on every RHS call; index 4 is the parking-orbit coast, 5 the TLI burn and
+# 6 the post-TLI coast. All five tables carry 7 entries so the lookup index
+# (searchsorted returns 6 after the TLI burn) stays in bounds everywhere
+_stage_ends = np.cumsum(np.array([tburn1, tburn2, tcoast, tburn3_1, tcoast3, tburn3_2], dtype=np.float64))
+_stage_t0 = np.concatenate((np.zeros(1), _stage_ends))
+_stage_m0 = np.array([m0, m0s2, m0s2 - m_dot2 * tburn2, m0s3,
+                      m0s3 - m_dot3 * tburn3_1, m0s3 - m_dot3 * tburn3_1,
+                      mstruc3 + mpl], dtype=np.float64)
+_stage_mdot = np.array([m_dot, m_dot2, 0.0, m_dot3, 0.0, m_dot3, 0.0])
+_stage_thrust = np.array([Thrust, Thrusts2, 0.0, Thrust3, 0.0, Thrust3, 0.0])
+
+
+@njit(cache=True, fastmath=True)
 def gravity_turn_program(t, h, v):
     """
     More sophisticated gravity turn program based on time and altitude
     Returns the target flight path angle in radians
-    
+
     Note: t is the simulation time which includes the launch delay
     """
     # If we're in the delay period, maintain vertical orientation
     if t < launch_delay:
         return 90 * deg
-        
-    # Adjust t to be time since actual launch
-    t_since_launch = t - launch_delay
-    
+
     if h <= hturn:
         # Initial vertical climb
         return 89.5 * deg
-    elif t_since_launch < tburn1:
-        # First stage - gradually pitch over from 90° to about 45° by end of S-IC
-        # Linear interpolation between initial pitch and target pitch
-        t_frac = (t_since_launch - (hturn / v0 if v0 > 0 else 10)) / tburn1  # normalized time after pitchover
-        return max((89.5 - 44.5 * t_frac) * deg, 45 * deg)
-    elif t_since_launch < tburn1 + tburn2:
-        # Second stage - continue pitching over to near horizontal
-        t_frac = (t_since_launch - tburn1) / tburn2  # normalized time in S-II
-        # More gradual transition to prevent diving - minimum angle of 5 degrees
-        return max((45 - 35 * t_frac) * deg, 5 * deg)
-    elif t_since_launch < tburn1 + tburn2 + tburn3_1:
-        # First S-IVB burn - approach orbital insertion
-        t_frac = (t_since_launch - tburn1 - tburn2) / tburn3_1  # normalized time in S-IVB
-        # Gradual transition to horizontal - minimum angle of 0 degrees (never negative)
-        return max((5 - 5 * t_frac) * deg, 0 * deg)
-    elif t_since_launch < tburn1 + tburn2 + tburn3_1 + tcoast3:
-        # Earth Parking Orbit coast phase - maintain 0 degrees for horizontal flight
-        return 0 * deg
-    elif t_since_launch < tburn1 + tburn2 + tburn3_1 + tcoast3 + tburn3_2:
-        # TLI burn - gradually adjust to escape trajectory
-        t_frac = (t_since_launch - (tburn1 + tburn2 + tburn3_1 + tcoast3)) / tburn3_2
-        # Start at 0 and gradually increase to ~10 degrees for TLI escape trajectory
-        return min(10 * t_frac * deg, 10 * deg)
-    else:
-        # Post-TLI - maintain escape trajectory toward Moon
-        return 2 * deg  # TLI angle toward Moon
 
-def derivatives(t, y):
+    # Adjust t to be time since actual launch and evaluate the segment table
+    t_since_launch = t - launch_delay
+    i = np.searchsorted(_pitch_ends, t_since_launch, side='right')
+    a = _pitch_a0[i] + _pitch_slope[i] * (t_since_launch - _pitch_t0[i])
+    return min(max(a, _pitch_lo[i]), _pitch_hi[i]) * deg
+
+@njit(cache=True, error_model="numpy")
+def _rhs(t, y):
+    """Compiled RHS kernel returning [v_dot, psi_dot, theta_dot, h_dot]
+
+    error_model="numpy" keeps division-by-zero propagating as inf (matching the
+    interpreted version) instead of raising, and fastmath is deliberately off
+    here: the solver relies on inf/nan from bad trial steps to shrink the step.
+    A fresh array is returned each call because solve_ivp keeps a reference to
+    the previous RHS value across rejected steps
+    """
+    out = np.empty(4)
     v = y[0]  # m/s
     psi = y[1]  # radians - flight path angle
-    theta = y[2]  # radians - downrange angle
     h = y[3]  # m - altitude
-    
+
     # If we're still in the delay period, keep the rocket stationary
     if t < launch_delay:
-        return [0, 0, 0, 0]
-    
+        out[0] = 0.0
+        out[1] = 0.0
+        out[2] = 0.0
+        out[3] = 0.0
+        return out
+
     # Limit the altitude for numerical stability
-    h = min(h, 1000000)  # Limit to 1000 km to prevent numerical issues
-    
+    h = min(h, 1000000.0)  # Limit to 1000 km to prevent numerical issues
+
     # Calculate radius from Earth's center
     r = Re + h
-    
-    # Calculate gravity with inverse square law
-    g = g0 * (Re / r) ** 2
-    
-    # Calculate atmospheric density (exponential model)
-    rho = rho0 * np.exp(-h / hscale) if h < 100000 else 0  # No significant atmosphere above 100km
-    
-    # Calculate drag
-    D = 0.5 * rho * v**2 * A * CD if v > 0 else 0
-    
+    inv_r = 1.0 / r
+
+    # Calculate gravity with inverse square law, sharing Re/r
+    Re_over_r = Re * inv_r
+    g = g0 * Re_over_r * Re_over_r
+
+    # Atmospheric density (exponential model) and drag - both are identically
+    # zero above 100 km, which is where most calls land once in orbit
+    if h < 100000:
+        rho = rho0 * math.exp(-h * (1.0 / hscale))
+        D = A_CD * rho * v * v if v > 0 else 0.0
+    else:
+        D = 0.0
+
     # Adjust time to be time since launch
     t_since_launch = t - launch_delay
-    
-    # Calculate mass and thrust for each stage - using time since actual launch
-    if t_since_launch < tburn1:
-        m = m0 - m_dot * t_since_launch
-        T = Thrust
-    elif t_since_launch < tburn1 + tburn2:
-        m = m0s2 - m_dot2 * (t_since_launch - tburn1)
-        T = Thrusts2
-    elif t_since_launch < tburn1 + tburn2 + tcoast:
-        m = m0s2 - m_dot2 * (tburn2)
-        T = 0
-    elif t_since_launch < tburn1 + tburn2 + tcoast + tburn3_1:
-        m = m0s3 - m_dot3 * (t_since_launch - tburn1 - tburn2 - tcoast)
-        T = Thrust3
-    elif t_since_launch < tburn1 + tburn2 + tcoast + tburn3_1 + tcoast3:
-        m = m0s3 - m_dot3 * tburn3_1
-        T = 0
-    elif t_since_launch < tburn1 + tburn2 + tcoast + tburn3_1 + tcoast3 + tburn3_2:
-        m = m0s3 - m_dot3 * (tburn3_1 + (t_since_launch - tburn1 - tburn2 - tcoast - tburn3_1 - tcoast3))
-        T = Thrust3
-    else:
-        m = mstruc3 + mpl
-        T = 0
-    
+
+    # Look up the active stage once; mass and thrust come from the tables
+    stage = np.searchsorted(_stage_ends, t_since_launch, side='right')
+    m = _stage_m0[stage] - _stage_mdot[stage] * (t_since_launch - _stage_t0[stage])
+    T = _stage_thrust[stage]
+
     # Get target flight path angle from gravity turn program
     target_psi = gravity_turn_program(t, h, v)
-    
+
     # Apply steering to gradually adjust flight path angle
     # More gentle steering rate based on altitude
     steering_factor = 0.02 if h < 50000 else 0.01  # Slower steering at higher altitudes
     psi_error = target_psi - psi
     psi_rate = steering_factor * psi_error  # Smoother control with reduced rate
-    
+
     # Prevent negative flight path angles during critical ascent phases
     if h < 150000 and psi < 0 and psi_rate < 0:
         psi_rate = max(psi_rate, 0.01)  # Force gentle upward correction if diving
-    
+
     # Calculate force components
     # Thrust along velocity vector
     thrust_force = T
-    
-    # Gravity force (always points down)
-    gravity_force = m * g
-    
+
+    # Shared per-call intermediates: each branch needs some combination of
+    # sin/cos(psi) and 1/r, so evaluate the transcendentals exactly once
+    sp = math.sin(psi)
+    cp = math.cos(psi)
+    g_sp = g * sp
+    h_dot = v * sp
+    theta_dot = v * cp * inv_r
+
     # Calculate accelerations
-    if t_since_launch < tburn1 + tburn2 + tcoast + tburn3_1 + tcoast3:  # Before TLI burn
+    if stage < 5:  # Before TLI burn
         if h < 160000:  # During atmospheric ascent and initial orbital insertion
             # Standard rocket equations with gravity turn
-            v_dot = (thrust_force - D) / m - g * np.sin(psi)  # Corrected gravity component
-            h_dot = v * np.sin(psi)
-            theta_dot = v * np.cos(psi) / (Re + h) 
+            v_dot = (thrust_force - D) / m - g_sp  # Corrected gravity component
             psi_dot = psi_rate
         else:
             # Orbital mechanics for Earth parking orbit
-            orbital_velocity = np.sqrt(g0 * Re**2 / r)
+            orbital_velocity = math.sqrt(GM * inv_r)
             v_target = orbital_velocity
             v_error = v_target - v
             v_dot = 0.1 * v_error  # Gentle adjustment toward orbital velocity
-            h_dot = v * np.sin(psi)
-            theta_dot = v * np.cos(psi) / r  # Angular velocity in orbit
             psi_dot = psi_rate  # Use controlled steering during orbit
     else:  # During and after TLI burn
         # TLI and beyond - escape trajectory calculations
-        if t_since_launch < tburn1 + tburn2 + tcoast + tburn3_1 + tcoast3 + tburn3_2:
+        if stage == 5:
             # During TLI burn - accelerate and change trajectory
-            v_dot = thrust_force / m - g * np.sin(psi)  # Accelerate to escape velocity
-            h_dot = v * np.sin(psi)
-            theta_dot = v * np.cos(psi) / (Re + h)
+            v_dot = thrust_force / m - g_sp  # Accelerate to escape velocity
             psi_dot = psi_rate  # Follow the gravity turn program for TLI
         else:
             # After TLI burn - coasting on escape trajectory
-            v_dot = -g * np.sin(psi)  # Only gravity affects velocity now
-            h_dot = v * np.sin(psi)
-            theta_dot = v * np.cos(psi) / (Re + h)
-            psi_dot = -g * np.cos(psi) / v + v * np.cos(psi) / (Re + h)  # Natural trajectory
-    
+            v_dot = -g_sp  # Only gravity affects velocity now
+            psi_dot = -g * cp / v + v * cp * inv_r  # Natural trajectory
+
     # Additional check to stabilize at orbital altitude during parking orbit
-    if t_since_launch < tburn1 + tburn2 + tcoast + tburn3_1 + tcoast3 and h > target_altitude_orbit and h_dot > 0 and h_dot < 10:
-        h_dot = 0  # Stabilize at target orbital altitude during parking orbit only
-    
-    return [v_dot, psi_dot, theta_dot, h_dot]
+    if stage < 5 and h > target_altitude_orbit and h_dot > 0 and h_dot < 10:
+        h_dot = 0.0  # Stabilize at target orbital altitude during parking orbit only
+
+    out[0] = v_dot
+    out[1] = psi_dot
+    out[2] = theta_dot
+    out[3] = h_dot
+    return out
+
+
+def derivatives(t, y):
+    """Thin wrapper for the solver; the real work happens in the compiled kernel"""
+    return _rhs(t, np.asarray(y, dtype=np.float64))
+
+
+def analytic_jac(t, y):
+    """Analytic 4x4 Jacobian of the RHS for LSODA, states [v, psi, theta, h]
+
+    Mass and thrust depend only on t so they contribute nothing; the pitch
+    program is piecewise in t with altitude only entering through thresholds,
+    so target_psi is treated as locally constant in h
+    """
+    v = y[0]
+    psi = y[1]
+    h = y[3]
+
+    J = np.zeros((4, 4))
+    if t < launch_delay:
+        return J
+
+    # Altitude clamp: above it the RHS no longer varies with h
+    dh_flag = 1.0 if h < 1000000 else 0.0
+    h = min(h, 1000000.0)
+    r = Re + h
+    g = GM / r**2
+    dg_dh = -2.0 * g / r * dh_flag
 
-# Run the simulation
-sol = solve_ivp(derivatives, [0, t_max], [v0, psi0, theta0, h0], rtol=1e-6, atol=1e-6)
+    sp = math.sin(psi)
+    cp = math.cos(psi)
+
+    if h < 100000:
+        rho = rho0 * math.exp(-h * (1.0 / hscale))
+    else:
+        rho = 0.0
+    if v > 0:
+        D = A_CD * rho * v * v
+        dD_dv = 2.0 * A_CD * rho * v
+    else:
+        D = 0.0
+        dD_dv = 0.0
+    dD_dh = -D / hscale * dh_flag
+
+    t_since_launch = t - launch_delay
+
+    # Steering row: psi_rate = steering_factor * (target_psi - psi), except
+    # when the anti-dive clamp pins it at a constant 0.01
+    steering_factor = 0.02 if h < 50000 else 0.01
+    psi_rate = steering_factor * (gravity_turn_program(t, h, v) - psi)
+    clamped = h < 150000 and psi < 0 and psi_rate < 0
+
+    # Mass is a function of t only; same stage tables as the RHS
+    stage = np.searchsorted(_stage_ends, t_since_launch, side='right')
+    m = _stage_m0[stage] - _stage_mdot[stage] * (t_since_launch - _stage_t0[stage])
+    before_tli = stage < 5
+    in_tli_burn = stage == 5
+
+    if before_tli and h >= 160000:
+        # Parking orbit: v_dot = 0.1 * (sqrt(g0 Re^2 / r) - v)
+        v_target = math.sqrt(GM / r)
+        J[0, 0] = -0.1
+        J[0, 3] = -0.05 * v_target / r * dh_flag
+        J[1, 1] = 0.0 if clamped else -steering_factor
+    elif before_tli:
+        # Powered ascent: v_dot = (T - D)/m - g sin(psi)
+        J[0, 0] = -dD_dv / m
+        J[0, 1] = -g * cp
+        J[0, 3] = -dD_dh / m - dg_dh * sp
+        J[1, 1] = 0.0 if clamped else -steering_factor
+    elif in_tli_burn:
+        # TLI burn: v_dot = T/m - g sin(psi), drag neglected
+        J[0, 1] = -g * cp
+        J[0, 3] = -dg_dh * sp
+        J[1, 1] = 0.0 if clamped else -steering_factor
+    else:
+        # Ballistic coast: v_dot = -g sin(psi), psi_dot = -g cos(psi)/v + v cos(psi)/r
+        J[0, 1] = -g * cp
+        J[0, 3] = -dg_dh * sp
+        J[1, 0] = g * cp / v**2 + cp / r
+        J[1, 1] = g * sp / v - v * sp / r
+        J[1, 3] = -dg_dh * cp / v - v * cp / r**2 * dh_flag
+
+    # theta_dot = v cos(psi) / r
+    J[2, 0] = cp / r
+    J[2, 1] = -v * sp / r
+    J[2, 3] = -v * cp / r**2 * dh_flag
+
+    # h_dot = v sin(psi), zeroed when the parking-orbit stabiliser pins it
+    h_dot = v * sp
+    if not (before_tli and h > target_altitude_orbit and 0 < h_dot < 10):
+        J[3, 0] = sp
+        J[3, 1] = v * cp
+
+    return J
+
+# Regression check: searchsorted returns index 6 (post-TLI coast) for any
+# time past the TLI burn, so every stage table must carry 7 entries and both
+# derivative paths must evaluate cleanly there — a short _stage_t0 table once
+# turned this lookup into an out-of-bounds read
+assert len(_stage_t0) == len(_stage_m0) == len(_stage_mdot) == len(_stage_thrust) == len(_stage_ends) + 1
+_t_chk = launch_delay + _stage_ends[-1] + 1.0
+_y_chk = np.array([7800.0, 0.0, 0.5, 300000.0], dtype=np.float64)
+assert np.all(np.isfinite(derivatives(_t_chk, _y_chk)))
+assert np.all(np.isfinite(analytic_jac(_t_chk, _y_chk)))
+
+# Run the simulation - LSODA with the analytic Jacobian crosses the long
+# coast phases in far fewer steps than the default RK45. Each smooth stage
+# segment is integrated separately, feeding the final state of one segment in
+# as the initial state of the next, so the adaptive error control never has to
+# cross a thrust/mass discontinuity mid-step (this also removes the max_step
+# cap that previously kept the solver from leaping over ignition during the
+# pad delay). The shared 1200-point grid keeps the combined output evenly
+# spaced regardless of step count; segment boundary samples are kept once
+_t_grid = np.linspace(0, t_max, 1200)
+_breaks = np.unique(np.concatenate(([0.0, launch_delay, t_max], launch_delay + _stage_ends)))
+_breaks = _breaks[_breaks <= t_max]
+_seg_ts = []
+_seg_ys = []
+_y = np.array([v0, psi0, theta0, h0], dtype=np.float64)
+_nfev = _njev = 0
+for _t0, _t1 in zip(_breaks[:-1], _breaks[1:]):
+    _inner = _t_grid[(_t_grid > _t0) & (_t_grid < _t1)]
+    sol = solve_ivp(derivatives, [_t0, _t1], _y, method='LSODA', jac=analytic_jac,
+                    t_eval=np.concatenate(([_t0], _inner, [_t1])), rtol=1e-6, atol=1e-6)
+    _y = sol.y[:, -1]
+    _nfev += sol.nfev
+    _njev += sol.njev
+    _keep = slice(None) if _t0 == 0.0 else slice(1, None)  # boundary sample already recorded
+    _seg_ts.append(sol.t[_keep])
+    _seg_ys.append(sol.y[:, _keep])
+# Stitch the segments back into a single OdeResult-shaped solution
+sol.t = np.concatenate(_seg_ts)
+sol.y = np.concatenate(_seg_ys, axis=1)
+sol.nfev = _nfev
+sol.njev = _njev
 
 psi = sol.y[1] # rad flight path angle
 psideg = psi/deg
@@ -248,7 +397,9 @@ dr = theta*Re / 1000 # km downrange distance
 h = sol.y[3]/1000 # km altitude
 htot = h + Re/1000 # km total
 t = sol.t
-vrel = sol.y[0]/1000 # % km/s velocity WITHOUT rotation of earth
+# Relative velocity (WITHOUT rotation of earth) is only printed at a handful
+# of sample indices, so it is read as scalars from sol.y where needed instead
+# of materializing a full km/s array
 vabs = sol.y[0] + omega * (Re + h*1000) * np.cos(latitude_39a)
 
 print(sol)
@@ -258,6 +409,17 @@ Rearray = np.full((100,1), Re/1000)
 
 # Define launch time for CZML - this will be the actual start time in the visualization
 launch_datetime = "1969-07-16T13:27:45Z"  # 4:15 before 13:32:00
+_epoch_dt = datetime(1969, 7, 16, 13, 27, 45)
+
+
+def iso_at(sec):
+    """ISO timestamp sec seconds after the CZML epoch (pad time 13:27:45)
+
+    datetime arithmetic carries minutes into hours correctly, unlike the
+    previous manual //3600 and %60 formatting
+    """
+    return (_epoch_dt + timedelta(seconds=float(sec))).strftime('%Y-%m-%dT%H:%M:%SZ')
+
 
 # Generate CZML data
 czml = [
@@ -266,7 +428,7 @@ czml = [
         "name": "Saturn V Trajectory",
         "version": "1.0",
         "clock": {
-            "interval": f"{launch_datetime}/1969-07-16T{13 + int(t_max) // 3600:02}:{(32 + (int(t_max) % 3600) // 60) % 60:02}:{(int(t_max) % 60):02}Z",
+            "interval": f"{launch_datetime}/{iso_at(t_max)}",
             "currentTime": launch_datetime,
             "range": "LOOP_STOP",
             "step": "SYSTEM_CLOCK_MULTIPLIER"
@@ -274,45 +436,27 @@ czml = [
     }
 ]
 
-# Add trajectory path - include stationary period
-positions = []
+# Add trajectory path - include stationary period; one vectorized pass over
+# the whole trajectory instead of a Python loop of scalar trig calls
 epoch = launch_datetime  # Start at the launch pad time
-for i in range(len(t)):
-    r = Re + h[i] * 1000 + altitude_39a + 2130  # Radius from Earth's center + manual adjustment 
-    x = r * np.cos(latitude_39a) * np.cos(longitude_39a + theta[i])  # X in meters
-    y = r * np.cos(latitude_39a) * np.sin(longitude_39a + theta[i])  # Y in meters
-    z = r * np.sin(latitude_39a)  # Z in meters
-    positions.extend([t[i], x, y, z])  # Time, X, Y, Z
-
-# Calculate the liftoff time as datetime string
-# Create time formatting function to handle the conversion
-def format_mission_time(base_time, seconds_to_add):
-    # Parse base time hours and minutes
-    base_hours = int(base_time.split('T')[1].split(':')[0])
-    base_minutes = int(base_time.split('T')[1].split(':')[1])
-    base_seconds = int(base_time.split('T')[1].split(':')[2].replace('Z', ''))
-    
-    # Calculate total seconds
-    total_seconds = base_seconds + seconds_to_add
-    
-    # Calculate new hours, minutes, seconds
-    new_seconds = total_seconds % 60
-    total_minutes = base_minutes + (total_seconds // 60)
-    new_minutes = total_minutes % 60
-    total_hours = base_hours + (total_minutes // 60)
-    new_hours = total_hours % 24
-    
-    # Format and return
-    return f"1969-07-16T{new_hours:02}:{new_minutes:02}:{new_seconds:02}Z"
+r_czml = Re + h * 1000 + altitude_39a + 2130  # Radius from Earth's center + manual adjustment
+lon_czml = longitude_39a + theta
+coslat = np.cos(latitude_39a)
+pos_buf = np.empty((len(t), 4))  # Time, X, Y, Z rows, filled column-wise
+pos_buf[:, 0] = t
+pos_buf[:, 1] = r_czml * coslat * np.cos(lon_czml)  # X in meters
+pos_buf[:, 2] = r_czml * coslat * np.sin(lon_czml)  # Y in meters
+pos_buf[:, 3] = r_czml * np.sin(latitude_39a)  # Z in meters
+positions = pos_buf.ravel().tolist()
 
 # Calculate actual liftoff time (after delay)
-liftoff_time = format_mission_time(launch_datetime, launch_delay)
+liftoff_time = iso_at(launch_delay)
 
 # Add Saturn V entity
 czml.append({
     "id": "SaturnV",
     "name": "Saturn V",
-    "availability": f"{launch_datetime}/{format_mission_time(launch_datetime, tli_end_time)}",
+    "availability": f"{launch_datetime}/{iso_at(tli_end_time)}",
     "model": {
         "gltf": "models/saturnv/saturnv.gltf",  # Correct model path (no leading slash)
         "minimumPixelSize": 128,
@@ -355,7 +499,7 @@ czml.append({
 czml.append({
     "id": "Post-TLI",
     "name": "CSM-LM",
-    "availability": f"{format_mission_time(launch_datetime, tli_end_time)}/{format_mission_time(launch_datetime, t_max)}",
+    "availability": f"{iso_at(tli_end_time)}/{iso_at(t_max)}",
     "model": {
         "gltf": "models/csm_lm/csmlm.gltf",  # Correct model path (no leading slash)
         "minimumPixelSize": 64,
@@ -396,8 +540,8 @@ stages = [
 ]
 
 for stage in stages:
-    stage_start_time = format_mission_time(launch_datetime, stage["start"])
-    stage_end_time = format_mission_time(launch_datetime, stage["end"])
+    stage_start_time = iso_at(stage["start"])
+    stage_end_time = iso_at(stage["end"])
     
     czml.append({
         "id": stage["id"],
@@ -406,10 +550,15 @@ for stage in stages:
         "description": f"{stage['name']} active from {stage['start']}s to {stage['end']}s"
     })
 
-# Write CZML to file
+# Write CZML to file - compact separators by default; the viewer does not
+# care about whitespace and indenting every scalar of the position array
+# roughly doubles the file
 czml_file_path = os.path.join(os.path.dirname(__file__), "saturn_v_trajectory_with_delay.czml")
 with open(czml_file_path, "w") as czml_file:
-    json.dump(czml, czml_file, indent=2)
+    if args.pretty:
+        json.dump(czml, czml_file, indent=2)
+    else:
+        json.dump(czml, czml_file, separators=(',', ':'))
 
 print(f"CZML file written to {czml_file_path}")
 
@@ -420,28 +569,31 @@ print(f"Launch time: {liftoff_time}")
 print(f"Total simulation time: {t[-1]:.1f} seconds")
 
 # Find indexes for key points
-launch_idx = np.argmax(t > launch_delay) if np.any(t > launch_delay) else 0
-s1_end_idx = np.argmax(t > launch_delay + tburn1) if np.any(t > launch_delay + tburn1) else -1
-s2_end_idx = np.argmax(t > launch_delay + tburn1 + tburn2) if np.any(t > launch_delay + tburn1 + tburn2) else -1
-orbit_idx = np.argmax(t > launch_delay + tburn1 + tburn2 + tburn3_1) if np.any(t > launch_delay + tburn1 + tburn2 + tburn3_1) else -1
+# t is monotonic, so binary searches replace the full-array argmax scans;
+# an index of len(t) means the event lies beyond the simulated window
+launch_idx, s1_end_idx, s2_end_idx, orbit_idx = np.searchsorted(
+    t, [launch_delay,
+        launch_delay + tburn1,
+        launch_delay + tburn1 + tburn2,
+        launch_delay + tburn1 + tburn2 + tburn3_1], side='right')
 
 # Print stage-specific data
 print(f"Initial launch pad altitude: {h[0]:.2f} km")
 
-if s1_end_idx > 0:
+if s1_end_idx < len(t):
     print(f"Altitude after Stage 1: {h[s1_end_idx]:.2f} km")
-    print(f"Velocity after Stage 1: {vrel[s1_end_idx]:.2f} km/s")
+    print(f"Velocity after Stage 1: {sol.y[0, s1_end_idx] / 1000:.2f} km/s")
 
-if s2_end_idx > 0:
+if s2_end_idx < len(t):
     print(f"Altitude after Stage 2: {h[s2_end_idx]:.2f} km")
-    print(f"Velocity after Stage 2: {vrel[s2_end_idx]:.2f} km/s")
+    print(f"Velocity after Stage 2: {sol.y[0, s2_end_idx] / 1000:.2f} km/s")
 
-if orbit_idx > 0:
+if orbit_idx < len(t):
     print(f"Orbital Altitude: {h[orbit_idx]:.2f} km")
-    print(f"Orbital Velocity: {vrel[orbit_idx]:.2f} km/s")
+    print(f"Orbital Velocity: {sol.y[0, orbit_idx] / 1000:.2f} km/s")
 
 print(f"Final Altitude: {h[-1]:.2f} km")
-print(f"Final Velocity (Relative): {vrel[-1]:.4f} km/s")
+print(f"Final Velocity (Relative): {sol.y[0, -1] / 1000:.4f} km/s")
 print(f"Final Velocity (Absolute): {vabs[-1]:.4f} km/s")
 print(f"Final Flight Path Angle: {psideg[-1]:.2f} degrees")
 print(f"Downrange Distance: {dr[-1]:.2f} km")
@@ -452,15 +604,26 @@ stage_colors = ['darkblue', 'blue', 'green', 'orange', 'purple', 'red', 'cyan']
 # Create time values that show minutes since simulation start
 minutes_elapsed = t / 60
 
+# Stage boundary positions shared by the time-series subplots: two vlines
+# calls per subplot (dashed starts, dotted ends) replace twelve axvline
+# artists; the figure-level legend below already names the stages
+stage_starts_min = np.array([stage["start"] for stage in stages]) / 60
+stage_ends_min = np.array([stage["end"] for stage in stages]) / 60
+stage_line_colors = stage_colors[:len(stages)]
+
+
+def mark_stage_boundaries(ax):
+    ax.vlines(stage_starts_min, *ax.get_ylim(), colors=stage_line_colors, linestyles='--')
+    ax.vlines(stage_ends_min, *ax.get_ylim(), colors=stage_line_colors, linestyles=':')
+
+
 # Plotting the results
 plt.figure(figsize=(12, 10))
 
 # Height vs Time (Top Left)
 plt.subplot(3, 2, 1)
 plt.plot(minutes_elapsed, h, label="Trajectory")
-for i, stage in enumerate(stages):
-    plt.axvline(stage["start"]/60, color=stage_colors[i], linestyle="--", label=f"{stage['name']} Start")
-    plt.axvline(stage["end"]/60, color=stage_colors[i], linestyle=":", label=f"{stage['name']} End")
+mark_stage_boundaries(plt.gca())
 plt.title('Altitude vs Time')
 plt.xlabel('Time (minutes)')
 plt.ylabel('Altitude (km)')
@@ -469,9 +632,7 @@ plt.grid(True)
 # Velocity vs Time (Middle Left)
 plt.subplot(3, 2, 3)
 plt.plot(minutes_elapsed, vabs, label="Velocity")
-for i, stage in enumerate(stages):
-    plt.axvline(stage["start"]/60, color=stage_colors[i], linestyle="--")
-    plt.axvline(stage["end"]/60, color=stage_colors[i], linestyle=":")
+mark_stage_boundaries(plt.gca())
 plt.title('Absolute Velocity vs Time')
 plt.xlabel('Time (minutes)')
 plt.ylabel('Velocity (km/s)')
@@ -480,9 +641,7 @@ plt.grid(True)
 # Flight Path Angle vs Time (Bottom Left)
 plt.subplot(3, 2, 5)
 plt.plot(minutes_elapsed, psideg, label="Flight Path Angle")
-for i, stage in enumerate(stages):
-    plt.axvline(stage["start"]/60, color=stage_colors[i], linestyle="--")
-    plt.axvline(stage["end"]/60, color=stage_colors[i], linestyle=":")
+mark_stage_boundaries(plt.gca())
 plt.title('Flight Path Angle vs Time')
 plt.xlabel('Time (minutes)')
 plt.ylabel('Flight Path Angle (deg)')
@@ -491,12 +650,15 @@ plt.grid(True)
 # Polar Trajectory Plot (Top Right)
 ax_polar = plt.subplot(3, 2, 2, projection='polar')
 
-# Plot trajectory with different colors for each stage
+# Plot trajectory with different colors for each stage; t is monotonic, so
+# one binary search yields slice boundaries and the plots take zero-copy
+# views instead of six boolean masks with fancy-indexed copies
 stage_times = [0] + [stage["end"] for stage in stages]
+stage_idx = np.searchsorted(t, stage_times)
 
-for i in range(len(stage_times) - 1):
-    mask = (t >= stage_times[i]) & (t < stage_times[i + 1])
-    ax_polar.plot(theta[mask], htot[mask], color=stage_colors[i], linewidth=2, label=f'{stages[i]["name"]}')
+for i in range(len(stage_idx) - 1):
+    seg = slice(stage_idx[i], stage_idx[i + 1])
+    ax_polar.plot(theta[seg], htot[seg], color=stage_colors[i], linewidth=2, label=f'{stages[i]["name"]}')
 
 ax_polar.plot(Rearraytheta, Rearray, label='Earth', color='black', linewidth=1.5)  # Earth circle
 ax_polar.set_title('Polar Trajectory (Distance vs Angle)')
@@ -507,9 +669,7 @@ ax_polar.grid(True)
 # Downrange Distance vs Time (Middle Right)
 plt.subplot(3, 2, 4)
 plt.plot(minutes_elapsed, dr, label="Downrange Distance")
-for i, stage in enumerate(stages):
-    plt.axvline(stage["start"]/60, color=stage_colors[i], linestyle="--")
-    plt.axvline(stage["end"]/60, color=stage_colors[i], linestyle=":")
+mark_stage_boundaries(plt.gca())
 plt.title('Downrange Distance vs Time')
 plt.xlabel('Time (minutes)')
 plt.ylabel('Downrange Distance (km)')